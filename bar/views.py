@@ -4,16 +4,20 @@ from django.shortcuts import render
 from django.views.generic import ListView
 
 from order.models import Location, Order
+from order.pagination import KeysetPaginationMixin
+from order.raport import day_bounds_local
+from order.reporting import ReportingViewMixin
 
 
 def bar_orders(request):
     return render(request, "bar/orders.html")
 
 
-class BarOrderKitchen(ListView):
+class BarOrderKitchen(ReportingViewMixin, KeysetPaginationMixin, ListView):
     model = Order
     template_name = "bar/history.html"
     context_object_name = "items"
+    paginate_by = 50
 
     def get_queryset(self):
         # Podstawowe filtrowanie: tylko "ready"
@@ -25,14 +29,21 @@ class BarOrderKitchen(ListView):
             try:
                 # Zamiana na obiekt daty
                 selected_date = datetime.strptime(day_str, "%Y-%m-%d").date()
-                queryset = queryset.filter(created_at__date=selected_date)
+                queryset = queryset.filter(
+                    created_at__range=day_bounds_local(selected_date)
+                )
             except ValueError:
                 pass
         else:
             # Domyslnie wyswietlaj dzien dzisiejszy
             today = datetime.now().date()
-            queryset = queryset.filter(created_at__date=today)
-        return queryset.order_by("-created_at")
+            # zakres zamiast __date, żeby użyć indeksu (status, category, created_at)
+            queryset = queryset.filter(created_at__range=day_bounds_local(today))
+        return (
+            queryset.select_related("bill")
+            .prefetch_related("bill__table", "order_items")
+            .order_by("-created_at", "-id")
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
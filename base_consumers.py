@@ -1,12 +1,22 @@
 import json
+from urllib.parse import parse_qs
 
-from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.layers import get_channel_layer
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from db_executors import db_read, db_write
+from order.board import (
+    get_board,
+    publish_bulk_status_update,
+    publish_status_update,
+    start_load_feed,
+    station_load_event,
+)
 from order.models import (
     Location,
     NotificationStatus,
@@ -15,8 +25,27 @@ from order.models import (
     OrderItemStatus,
     StatusOrder,
 )
+from order.notifications import (
+    NOTIFICATIONS_GROUP,
+    notification_payload,
+    notify_orders_ready,
+    release_notifications,
+)
+from order.report_cache import invalidate_days_on_commit
+from order.rollup import refresh_readied_days
+from order.throughput import record_orders_readied
 from worker.models import Worker
 
+STATUS_ACTIONS = {
+    "preparing": StatusOrder.PREPARING,
+    "ready": StatusOrder.READY,
+}
+
+ALLOWED_PREVIOUS_STATUS = {
+    StatusOrder.PREPARING: [StatusOrder.ORDER],
+    StatusOrder.READY: [StatusOrder.ORDER, StatusOrder.PREPARING],
+}
+
 
 class BaseConsumer(AsyncWebsocketConsumer):
     GROUP_NAME: str
@@ -31,11 +60,41 @@ class BaseConsumer(AsyncWebsocketConsumer):
 
         print(f"Connected to {self.CATEGORY} orders group: {self.GROUP_NAME}")
 
+        board = get_board(self.CATEGORY)
+        if not board.is_loaded:
+            await db_read(board.load)()
+        start_load_feed()
+
+        # Wznowienie: klient podaje `epoch` i `last_seq` ostatniego zdarzenia
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        try:
+            last_seq = int(params.get("last_seq", [""])[0])
+        except ValueError:
+            last_seq = None
+        epoch = params.get("epoch", [""])[0]
+
+        missed = None
+        if last_seq is not None:
+            missed = board.events_since(epoch, last_seq)
+        if missed is not None:
+            for event in missed:
+                await self.send(text_data=json.dumps(event))
+            await self.send(text_data=json.dumps(station_load_event(board)))
+            return
+
         # Capture the existing orders
-        orders = await self.get_initial_orders()
+        seq, orders = board.snapshot_with_seq()
         await self.send(
-            text_data=json.dumps({"type": "initial_orders", "orders": orders})
+            text_data=json.dumps(
+                {
+                    "type": "initial_orders",
+                    "orders": orders,
+                    "seq": seq,
+                    "epoch": board.epoch,
+                }
+            )
         )
+        await self.send(text_data=json.dumps(station_load_event(board)))
 
     async def disconnect(self, close_code):
         """
@@ -59,67 +118,112 @@ class BaseConsumer(AsyncWebsocketConsumer):
             return
 
         elif action == "item_done":
+            item_ids = data.get("item_ids")
             item_id = data.get("item_id")
             username = data.get("username")
-            if item_id and username:
+            if item_ids:
+                await self.send_notifications(item_ids)
+            elif item_id and username:
                 await self.send_notification(order_id, item_id)
 
-        elif order_id and action:
-            new_status = None
-            if action == "preparing":
-                new_status = StatusOrder.PREPARING
-            elif action == "ready":
-                new_status = StatusOrder.READY
-
-            if new_status:
-                # Wywołanie synchronicznej metody do operacji na bazie danych
-                await sync_to_async(self.update_order_status)(order_id, new_status)
-
-                # Wysyłanie powiadomienia do całej grupy, że status został zmieniony
-                await self.channel_layer.group_send(
-                    self.GROUP_NAME,
-                    {
-                        "type": "order_status_update",
-                        "order_id": order_id,
-                        "new_status": new_status,
-                    },
-                )
-
-    def update_order_status(self, order_id, new_status):
+        elif action in STATUS_ACTIONS:
+            new_status = STATUS_ACTIONS[action]
+            order_ids = data.get("order_ids")
+            # Wywołanie synchronicznej metody do operacji na bazie danych.
+            # Powiadomienie grupy (z numerem `seq`) wysyła tylko zwycięzca.
+            if order_ids:
+                await db_write(self.update_orders_status)(order_ids, new_status)
+            elif order_id:
+                await db_write(self.update_order_status)(order_id, new_status)
+
+    @staticmethod
+    def _apply_order_status(order_ids, new_status, now) -> int:
+        """
+        Warunkowy UPDATE zamówień pilnujący poprzedniego statusu.
+        Zwraca liczbę zmienionych wierszy.
+        """
+        orders = Order.objects.filter(
+            id__in=order_ids, status__in=ALLOWED_PREVIOUS_STATUS[new_status]
+        )
+        if new_status == StatusOrder.PREPARING:
+            return orders.update(status=new_status, preparing_at=now)
+        # gdy ktoś przeskoczył PREPARING, preparing_at = readied_at
+        return orders.update(
+            status=new_status,
+            readied_at=now,
+            preparing_at=Coalesce("preparing_at", Value(now)),
+        )
+
+    @staticmethod
+    def _apply_items_status(order_ids, new_status, now):
+        # change all order items status to PREPARING and set started_at
+        if new_status == StatusOrder.PREPARING:
+            OrderItem.objects.filter(
+                order_id__in=order_ids, status=OrderItemStatus.WAITING
+            ).update(status=OrderItemStatus.PREPARING, started_at=now)
+        else:
+            # when started_at is null set started_at to current time
+            OrderItem.objects.filter(order_id__in=order_ids).update(
+                status=OrderItemStatus.READY,
+                finished_at=now,
+                started_at=Coalesce("started_at", Value(now)),
+            )
+
+    def update_order_status(self, order_id, new_status) -> bool:
         """
         Synchroniczna metoda do aktualizacji statusu zamówienia w bazie danych.
-        Jest wywoływana przez `sync_to_async`, aby nie blokować głównego wątku.
+        Jest wywoływana przez `db_write` (wątek zapisów), aby nie blokować głównego wątku.
+
+        Przejście ORDER -> PREPARING -> READY to warunkowy UPDATE pilnujący
+        poprzedniego statusu (stała liczba zapytań, jedna transakcja).
+        Gdy dwa ekrany klikną jednocześnie, tylko pierwszy zmieni wiersz;
+        zwraca True tylko dla zwycięzcy i tylko on rozsyła zmianę.
         """
-        try:
-            order = Order.objects.get(id=order_id)
-            order.status = new_status
-            # change all order items status to PREPARING and set started_at
-            if new_status == StatusOrder.PREPARING:
-                OrderItem.objects.filter(
-                    Q(order=order) & Q(status=OrderItemStatus.WAITING)
-                ).update(
-                    status=OrderItemStatus.PREPARING,
-                    started_at=timezone.now(),
-                )
-                order.preparing_at = timezone.now()
-            elif new_status == StatusOrder.READY:
-                # TODO: if start_at doesn't exist set finished time
-                OrderItem.objects.filter(order=order).update(
-                    status=OrderItemStatus.READY,
-                    finished_at=timezone.now(),
-                )
-                # when start_ad is null set started_at to current time
-                OrderItem.objects.filter(order=order, started_at__isnull=True).update(
-                    started_at=timezone.now(),
-                )
-                order.finished_at = timezone.now()
+        now = timezone.now()
+        with transaction.atomic():
+            if not self._apply_order_status([order_id], new_status, now):
+                print(f"Order {order_id} was not {new_status}: missing or changed.")
+                return False
+            self._apply_items_status([order_id], new_status, now)
+
+            transaction.on_commit(
+                lambda: publish_status_update(self.CATEGORY, order_id, new_status)
+            )
+            if new_status == StatusOrder.READY:
+                record_orders_readied([order_id])
+                invalidate_days_on_commit(refresh_readied_days([order_id]))
+                transaction.on_commit(lambda: notify_orders_ready([order_id]))
+        print(f"Order {order_id} status updated to {new_status}")
+        return True
+
+    def update_orders_status(self, order_ids, new_status) -> list[int]:
+        """
+        Wersja zbiorcza `update_order_status`: wszystkie zamówienia w jednej
+        transakcji (stała liczba zapytań niezależnie od ich liczby) i jedno
+        zbiorcze zdarzenie dla grupy. Zwraca id zamówień, które zmienił ten wywołujący.
+        """
+        now = timezone.now()
+        stamp = "preparing_at" if new_status == StatusOrder.PREPARING else "readied_at"
+        with transaction.atomic():
+            if not self._apply_order_status(order_ids, new_status, now):
+                return []
+            # zwycięzcy to wiersze ostemplowane czasem tej transakcji
+            winners = list(
+                Order.objects.filter(
+                    id__in=order_ids, status=new_status, **{stamp: now}
+                ).values_list("id", flat=True)
+            )
+            self._apply_items_status(winners, new_status, now)
 
+            transaction.on_commit(
+                lambda: publish_bulk_status_update(self.CATEGORY, winners, new_status)
+            )
             if new_status == StatusOrder.READY:
-                order.readied_at = timezone.now()
-            order.save()
-            print(f"Order {order_id} status updated to {new_status}")
-        except Order.DoesNotExist:
-            print(f"Error: Order with ID {order_id} does not exist.")
+                record_orders_readied(winners)
+                invalidate_days_on_commit(refresh_readied_days(winners))
+                transaction.on_commit(lambda: notify_orders_ready(winners))
+        print(f"Orders {winners} status updated to {new_status}")
+        return winners
 
     async def order_status_update(self, event):
         """
@@ -132,6 +236,7 @@ class BaseConsumer(AsyncWebsocketConsumer):
                     "type": "order_status_update",
                     "order_id": event["order_id"],
                     "new_status": event["new_status"],
+                    "seq": event.get("seq"),
                 }
             )
         )
@@ -143,55 +248,34 @@ class BaseConsumer(AsyncWebsocketConsumer):
         """
         order_data = event["order_data"]
         await self.send(
-            text_data=json.dumps({"type": "new_order", "order": order_data})
+            text_data=json.dumps(
+                {"type": "new_order", "order": order_data, "seq": event.get("seq")}
+            )
         )
 
-    @sync_to_async
-    def get_initial_orders(self):
+    async def orders_status_update(self, event):
         """
-        Synchroniczna metoda do pobierania początkowych zamówień z bazy danych.
-        Jest wywoływana przez `sync_to_async`.
+        Zbiorcza zmiana statusu wielu zamówień (jedna wiadomość dla grupy).
         """
-        orders = Order.objects.filter(
-            status__in=[StatusOrder.ORDER, StatusOrder.PREPARING],
-            category=self.CATEGORY,
-        ).order_by("created_at")
-        orders_list = []
-        for order in orders:
-            order_items = []
-            for item in order.order_items.order_by("name_snapshot").all():
-                notification_status = None
-                try:
-                    notification_status = item.notification.status
-                except OrderItem.notification.RelatedObjectDoesNotExist:
-                    pass
-
-                order_items.append(
-                    {
-                        "id": item.id,
-                        "name_snapshot": item.full_name_snapshot,
-                        "quantity": item.quantity,
-                        "note": item.note,
-                        "is_done": notification_status
-                        in [NotificationStatus.WAIT, NotificationStatus.SERVE],
-                    }
-                )
-            orders_list.append(
+        await self.send(
+            text_data=json.dumps(
                 {
-                    "id": order.id,
-                    "sender": order.bill.service.user.username,
-                    "table": order.bill.str_tables(),
-                    "status": order.status,
-                    "order_items": order_items,
-                    "created_at": timezone.localtime(order.created_at).strftime(
-                        "%Y-%m-%d %H:%M:%S"
-                    ),
+                    "type": "orders_status_update",
+                    "order_ids": event["order_ids"],
+                    "new_status": event["new_status"],
+                    "seq": event.get("seq"),
                 }
             )
+        )
 
-        return orders_list
+    async def station_load(self, event):
+        """
+        Obciążenie stacji rozsyłane cyklicznie (zob. `order.board.start_load_feed`).
+        Bez `seq` - to stan chwilowy, nie zdarzenie do wznowienia.
+        """
+        await self.send(text_data=json.dumps(event))
 
-    @sync_to_async
+    @db_write
     def get_notification_data(self, order_id, item_id):
         """
         Synchroniczna metoda do tworzenia notyfikacji w bazie danych.
@@ -208,19 +292,9 @@ class BaseConsumer(AsyncWebsocketConsumer):
 
             notification.status = NotificationStatus.WAIT
             notification.save()
+            get_board(self.CATEGORY).mark_item_done(order_item.order_id, item_id)
 
-            return {
-                "id": notification.id,
-                "worker": str(notification.worker),
-                "order_item": notification.order_item.full_name_snapshot
-                + (
-                    f" ({notification.order_item.note})"
-                    if notification.order_item.note
-                    else ""
-                ),
-                "table": notification.order_item.order.bill.str_tables(),
-                "created_at": notification.last_update.isoformat(),
-            }
+            return notification_payload(notification)
         except (OrderItem.DoesNotExist, User.DoesNotExist, Worker.DoesNotExist) as e:
             print(f"Error creating notification: {e}")
             return None
@@ -243,3 +317,23 @@ class BaseConsumer(AsyncWebsocketConsumer):
             print(f"Notification for item {item_id} sent to 'notifications' group.")
         else:
             print(f"Notification already exists for item {item_id}.")
+
+    @db_write
+    def get_notifications_data(self, item_ids):
+        """
+        Zbiorcza wersja `get_notification_data`: wszystkie pozycje w jednej
+        transakcji, zwraca payloady notyfikacji do wysłania jedną wiadomością.
+        """
+        with transaction.atomic():
+            payloads = release_notifications(item_ids=item_ids, category=self.CATEGORY)
+        get_board(self.CATEGORY).mark_items_done(item_ids)
+        return payloads
+
+    async def send_notifications(self, item_ids):
+        payloads = await self.get_notifications_data(item_ids)
+        if payloads:
+            await self.channel_layer.group_send(
+                NOTIFICATIONS_GROUP,
+                {"type": "new_notifications", "notifications": payloads},
+            )
+        print(f"{len(payloads)} notifications sent to 'notifications' group.")
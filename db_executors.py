@@ -0,0 +1,266 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import wraps
+
+from channels.db import DatabaseSyncToAsync
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """
+    Pula wątków dla zapytań konsumentów websocket, która liczy głębokość
+    kolejki i czas oczekiwania zadania na wolny wątek.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"db-{name}")
+        self.name = name
+        self.workers = max_workers
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.queued = 0
+        self.running = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def submit(self, fn, /, *args, **kwargs):
+        enqueued_at = time.monotonic()
+        with self._stats_lock:
+            self.submitted += 1
+            self.queued += 1
+
+        def run():
+            wait = time.monotonic() - enqueued_at
+            with self._stats_lock:
+                self.queued -= 1
+                self.running += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._stats_lock:
+                    self.running -= 1
+                    self.completed += 1
+
+        return super().submit(run)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            started = self.submitted - self.queued
+            return {
+                "workers": self.workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "queued": self.queued,
+                "running": self.running,
+                "avg_wait_ms": round(1000 * self.total_wait / started, 3)
+                if started
+                else 0.0,
+                "max_wait_ms": round(1000 * self.max_wait, 3),
+            }
+
+
+_executors: dict[str, InstrumentedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(kind: str) -> InstrumentedExecutor:
+    """Pula `read` - snapshoty tylko do odczytu (zapisy: `WriteCoordinator`)."""
+    with _executors_lock:
+        if kind not in _executors:
+            config = settings.CONSUMER_DB_EXECUTOR
+            _executors[kind] = InstrumentedExecutor(
+                kind, config[f"{kind.upper()}_WORKERS"]
+            )
+        return _executors[kind]
+
+
+def db_read(func):
+    """Jak `database_sync_to_async`, ale na puli odczytów."""
+    return DatabaseSyncToAsync(
+        func, thread_sensitive=False, executor=get_executor("read")
+    )
+
+
+class WriteCoordinator:
+    """
+    Jedyny wątek zapisujący zmiany z konsumentów websocket. SQLite wpuszcza
+    naraz jednego piszącego, więc zamiast walczyć o blokadę zapisy czekają
+    w kolejce. Zadania, które zebrały się w kolejce podczas poprzedniej
+    transakcji (plus te z okna `window`, najwyżej `batch_size`), idą w jednej
+    transakcji. Future zadania dostaje wynik dopiero po commicie, a callbacki
+    `on_commit` zadań wykonują się po nim (każdy osobno, jak `robust=True`).
+    """
+
+    def __init__(self, window: float, batch_size: int):
+        self.window = window
+        self.batch_size = batch_size
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.batches = 0
+        self.retried = 0
+        self.hook_errors = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        self._ensure_started()
+        future = Future()
+        with self._stats_lock:
+            self.submitted += 1
+        self._queue.put((fn, args, kwargs, future, time.monotonic()))
+        return future
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="db-write", daemon=True
+                )
+                self._thread.start()
+
+    def _next_batch(self) -> list:
+        """Wszystko, co czeka w kolejce, plus to, co dojdzie w oknie `window`."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.monotonic()
+            # jak DatabaseSyncToAsync: zamyka zerwane i przeterminowane połączenia
+            close_old_connections()
+            results = self._execute(batch)
+            self._record(batch, results, started)
+            for future, result, error in results:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    def _execute(self, batch) -> list:
+        """
+        Paczka w jednej transakcji. Gdy któreś zadanie rzuci wyjątek przed
+        commitem, cała paczka jest wycofywana i zadania wykonują się ponownie
+        pojedynczo, więc błąd jednego nie psuje pozostałych (bez savepointu
+        na zadanie). Callbacki `on_commit` wykonuje `_run_hooks` już po
+        commicie - ich błąd nie może powtórzyć zapisanej paczki.
+        """
+        connection = transaction.get_connection()
+        try:
+            with transaction.atomic():
+                results = [
+                    (future, fn(*args, **kwargs), None)
+                    for fn, args, kwargs, future, _ in batch
+                ]
+                # zabrane przed wyjściem z atomic(), więc Django ich nie wykona
+                hooks, connection.run_on_commit = connection.run_on_commit, []
+        except Exception as e:
+            if len(batch) == 1:
+                return [(batch[0][3], None, e)]
+            with self._stats_lock:
+                self.retried += len(batch)
+            return [result for task in batch for result in self._execute([task])]
+        self._run_hooks(hooks)
+        return results
+
+    def _run_hooks(self, hooks):
+        """Każdy callback osobno: błąd jednego (np. Redis) nie blokuje reszty."""
+        for _, func, _ in hooks:
+            try:
+                func()
+            except Exception as e:
+                with self._stats_lock:
+                    self.hook_errors += 1
+                print(f"db-write: on_commit callback {func.__qualname__} failed: {e!r}")
+
+    def _record(self, batch, results, started):
+        with self._stats_lock:
+            self.batches += 1
+            for *_, enqueued_at in batch:
+                wait = started - enqueued_at
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            failed = sum(error is not None for *_, error in results)
+            self.failed += failed
+            self.completed += len(results) - failed
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            done = self.completed + self.failed
+            return {
+                "window_ms": round(1000 * self.window, 3),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "queued": self.submitted - done,
+                "batches": self.batches,
+                "retried": self.retried,
+                "hook_errors": self.hook_errors,
+                "avg_batch": round(done / self.batches, 2) if self.batches else 0.0,
+                "avg_wait_ms": (
+                    round(1000 * self.total_wait / done, 3) if done else 0.0
+                ),
+                "max_wait_ms": round(1000 * self.max_wait, 3),
+            }
+
+
+_write_coordinator = None
+
+
+def get_write_coordinator() -> WriteCoordinator:
+    global _write_coordinator
+    with _executors_lock:
+        if _write_coordinator is None:
+            config = settings.CONSUMER_DB_EXECUTOR
+            _write_coordinator = WriteCoordinator(
+                config["WRITE_WINDOW_MS"] / 1000, config["WRITE_BATCH_SIZE"]
+            )
+        return _write_coordinator
+
+
+def db_write(func):
+    """
+    Jak `database_sync_to_async`, ale przez `WriteCoordinator`: zapis
+    czeka na wspólną transakcję i zwraca wynik po jej commicie.
+    """
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        future = get_write_coordinator().submit(func, *args, **kwargs)
+        return await asyncio.wrap_future(future)
+
+    return wrapper
+
+
+def executor_stats() -> dict:
+    with _executors_lock:
+        stats = {kind: executor.stats() for kind, executor in _executors.items()}
+        if _write_coordinator is not None:
+            stats["write"] = _write_coordinator.stats()
+        return stats
@@ -89,12 +89,57 @@ WSGI_APPLICATION = "gastroflow.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Pragmy każdego połączenia SQLite (sprawdzane przez order.checks):
+# WAL - czytający nie blokują piszącego, NORMAL - fsync tylko przy checkpoincie,
+# busy_timeout - piszący czeka na blokadę zamiast od razu "database is locked"
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": -20000,  # KiB (ujemne), ok. 20 MB na połączenie
+    "mmap_size": 128 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "OPTIONS": {
+            "init_command": "".join(
+                f"PRAGMA {name}={value};" for name, value in SQLITE_PRAGMAS.items()
+            ),
+            # blokada zapisu od BEGIN - bez "database is locked" przy
+            # podnoszeniu blokady odczytu do zapisu w środku transakcji
+            "transaction_mode": "IMMEDIATE",
+            "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000,
+        },
+        # pod ASGI kod synchroniczny każdego żądania działa we własnym
+        # ThreadSensitiveContext (nowy wątek), więc połączenie trzymane na
+        # wątek nie byłoby ponownie użyte - zamykamy je po żądaniu;
+        # DB_CONN_MAX_AGE > 0 tylko dla wdrożenia WSGI
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "0")),
+        "CONN_HEALTH_CHECKS": True,
+    },
+    # kopia `default` dla raportów i historii (zob. order.reporting)
+    "reporting": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv("REPORTING_DB_PATH", BASE_DIR / "db.reporting.sqlite3"),
+        "OPTIONS": {
+            # tylko odczyt; tryb dziennika kopii ustala backup
+            "init_command": "".join(
+                f"PRAGMA {name}={SQLITE_PRAGMAS[name]};"
+                for name in ("busy_timeout", "cache_size", "mmap_size", "temp_store")
+            ),
+        },
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "0")),
+        "CONN_HEALTH_CHECKS": True,
+        "TEST": {"MIRROR": "default"},
+    },
 }
+DATABASE_ROUTERS = ["order.reporting.ReportingRouter"]
+# po ilu sekundach widok raportowy odświeża kopię bazy
+REPORTING_SNAPSHOT_MAX_AGE = int(os.getenv("REPORTING_SNAPSHOT_MAX_AGE", "60"))
 
 
 # Password validation
@@ -155,3 +200,13 @@ CHANNEL_LAYERS = {
         "CONFIG": {"hosts": ["redis://127.0.0.1:6379/0"]},
     },
 }
+
+# Zapytania konsumentów websocket (db_executors.py): pula wątków odczytów
+# (snapshoty ekranów) i jeden wątek zapisów. Zapisy zebrane w kolejce podczas
+# poprzedniej transakcji (najwyżej WRITE_BATCH_SIZE) idą w jednej; okno
+# WRITE_WINDOW_MS > 0 dokłada czekanie na kolejne kosztem opóźnienia
+CONSUMER_DB_EXECUTOR = {
+    "READ_WORKERS": int(os.getenv("CONSUMER_DB_READ_WORKERS", "4")),
+    "WRITE_WINDOW_MS": float(os.getenv("CONSUMER_DB_WRITE_WINDOW_MS", "0")),
+    "WRITE_BATCH_SIZE": int(os.getenv("CONSUMER_DB_WRITE_BATCH_SIZE", "20")),
+}
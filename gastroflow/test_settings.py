@@ -0,0 +1,14 @@
+"""
+Ustawienia testów: `python manage.py test --settings=gastroflow.test_settings`.
+
+Migracje nie są w repozytorium (run_script.sh robi makemigrations), więc
+tabele testowe tworzymy prosto z modeli; warstwa kanałów bez Redisa.
+"""
+
+from gastroflow.settings import *  # noqa: F401,F403
+
+MIGRATION_MODULES = {
+    app: None for app in ("menu", "worker", "order", "service", "kitchen", "bar")
+}
+
+CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
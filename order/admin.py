@@ -1,9 +1,21 @@
 from django.contrib import admin
 
-from .models import Bill, Notification, Order, OrderItem, OrderItemAddition
+from .models import (
+    Bill,
+    DailyFacts,
+    DailyPrepTimes,
+    HourlyThroughput,
+    Notification,
+    Order,
+    OrderItem,
+    OrderItemAddition,
+)
 
 admin.site.register(Bill)
 admin.site.register(Order)
 admin.site.register(OrderItem)
 admin.site.register(OrderItemAddition)
 admin.site.register(Notification)
+admin.site.register(DailyFacts)
+admin.site.register(DailyPrepTimes)
+admin.site.register(HourlyThroughput)
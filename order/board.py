@@ -0,0 +1,357 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from menu.models import Location
+from order.models import StatusOrder
+from order.snapshots import (
+    CREATED_AT_FORMAT,
+    OPEN_ORDER_STATUSES,
+    build_orders_snapshot,
+)
+
+# ile ostatnich zdarzeń trzymamy do wznowienia po ponownym połączeniu
+EVENT_BUFFER_SIZE = 200
+# okno (sekundy) średniego czasu oczekiwania wydanych zamówień
+LOAD_WINDOW = 15 * 60
+READY_WAITS_SIZE = 1000
+# co ile sekund ekrany stacji dostają `station_load`
+LOAD_FEED_INTERVAL = 5
+
+GROUP_NAMES = {
+    Location.KITCHEN: "kitchen_orders",
+    Location.BAR: "bar_orders",
+}
+
+
+@dataclass(slots=True)
+class BoardItem:
+    id: int
+    name: str
+    quantity: int
+    note: Optional[str]
+    is_done: bool = False
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "BoardItem":
+        return cls(
+            id=payload["id"],
+            name=payload["name_snapshot"],
+            quantity=payload["quantity"],
+            note=payload["note"],
+            is_done=payload.get("is_done", False),
+        )
+
+    def to_payload(self) -> dict:
+        return {
+            "id": self.id,
+            "name_snapshot": self.name,
+            "quantity": self.quantity,
+            "note": self.note,
+            "is_done": self.is_done,
+        }
+
+
+@dataclass(slots=True)
+class BoardOrder:
+    id: int
+    sender: str
+    table: str
+    status: str
+    created_at: str
+    items: list[BoardItem] = field(default_factory=list)
+    # created_at jako znacznik czasu (do statystyk obciążenia)
+    created_ts: float = 0.0
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "BoardOrder":
+        created = datetime.strptime(payload["created_at"], CREATED_AT_FORMAT)
+        return cls(
+            id=payload["id"],
+            sender=payload["sender"],
+            table=payload["table"],
+            status=payload["status"],
+            created_at=payload["created_at"],
+            items=[BoardItem.from_payload(i) for i in payload["order_items"]],
+            created_ts=timezone.make_aware(created).timestamp(),
+        )
+
+    def to_payload(self) -> dict:
+        return {
+            "id": self.id,
+            "sender": self.sender,
+            "table": self.table,
+            "status": self.status,
+            "order_items": [i.to_payload() for i in self.items],
+            "created_at": self.created_at,
+        }
+
+
+class LiveBoard:
+    """
+    Stan otwartych zamówień (ORDER/PREPARING) jednej stacji trzymany w pamięci
+    procesu. Ładowany z bazy raz, potem aktualizowany w miejscu przez ścieżki
+    zapisu (create_order, zmiana statusu, usunięcie pozycji, sygnały), dzięki
+    czemu `connect()` konsumenta nie wykonuje żadnych zapytań.
+
+    Zdarzenia `new_order` / `order_status_update` dostają kolejny numer `seq`
+    i trafiają do bufora cyklicznego, z którego ekran wznawiający połączenie
+    dostaje tylko to, co przegapił. `epoch` zmienia się przy restarcie procesu,
+    więc stare `seq` klienta nie pomylą się z nowymi.
+    """
+
+    def __init__(self, location: Location, group_name: str):
+        self.location = location
+        self.group_name = group_name
+        self.epoch = uuid.uuid4().hex[:12]
+        self._orders: dict[int, BoardOrder] = {}
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._seq = 0
+        self._events: deque[dict] = deque(maxlen=EVENT_BUFFER_SIZE)
+        # (czas wydania, sekundy od złożenia) wydanych zamówień
+        self._ready_waits: deque[tuple[float, float]] = deque(maxlen=READY_WAITS_SIZE)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def load(self):
+        with self._lock:
+            orders = build_orders_snapshot(self.location)
+            self._orders = {o["id"]: BoardOrder.from_payload(o) for o in orders}
+            self._loaded = True
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            return [order.to_payload() for order in self._orders.values()]
+
+    def snapshot_with_seq(self) -> tuple[int, list[dict]]:
+        """Stan tablicy razem z numerem ostatniego zdarzenia, które go zmieniło."""
+        with self._lock:
+            return self._seq, self.snapshot()
+
+    def _record(self, frame: dict) -> int:
+        self._seq += 1
+        self._events.append({**frame, "seq": self._seq})
+        return self._seq
+
+    def events_since(self, epoch: str, last_seq: int) -> Optional[list[dict]]:
+        """
+        Zdarzenia o numerze większym niż `last_seq`.
+        None, gdy trzeba wysłać pełny stan: inny `epoch` (restart procesu)
+        albo bufor już nie zawiera wszystkich brakujących zdarzeń.
+        """
+        with self._lock:
+            if epoch != self.epoch or last_seq > self._seq:
+                return None
+            if last_seq == self._seq:
+                return []
+            if not self._events or self._events[0]["seq"] > last_seq + 1:
+                return None
+            return [e for e in self._events if e["seq"] > last_seq]
+
+    def add_order(self, payload: dict) -> int:
+        with self._lock:
+            if self._loaded:
+                self._orders[payload["id"]] = BoardOrder.from_payload(payload)
+            return self._record({"type": "new_order", "order": payload})
+
+    def _apply_status(self, order_id: int, status: str):
+        if status not in OPEN_ORDER_STATUSES:
+            order = self._orders.pop(order_id, None)
+            if order is not None and status == StatusOrder.READY:
+                now = time.time()
+                self._ready_waits.append((now, now - order.created_ts))
+        elif order_id in self._orders:
+            self._orders[order_id].status = status
+
+    def set_status(self, order_id: int, status: str) -> int:
+        with self._lock:
+            self._apply_status(order_id, status)
+            return self._record(
+                {
+                    "type": "order_status_update",
+                    "order_id": order_id,
+                    "new_status": status,
+                }
+            )
+
+    def set_status_many(self, order_ids: list[int], status: str) -> int:
+        with self._lock:
+            for order_id in order_ids:
+                self._apply_status(order_id, status)
+            return self._record(
+                {
+                    "type": "orders_status_update",
+                    "order_ids": order_ids,
+                    "new_status": status,
+                }
+            )
+
+    def discard_order(self, order_id: int):
+        with self._lock:
+            self._orders.pop(order_id, None)
+
+    def remove_item(self, order_id: int, item_id: int):
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order is not None:
+                order.items = [i for i in order.items if i.id != item_id]
+
+    def mark_item_done(self, order_id: int, item_id: int):
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order is None:
+                return
+            for item in order.items:
+                if item.id == item_id:
+                    item.is_done = True
+
+    def mark_items_done(self, item_ids: list[int]):
+        item_ids = set(item_ids)
+        with self._lock:
+            for order in self._orders.values():
+                for item in order.items:
+                    if item.id in item_ids:
+                        item.is_done = True
+
+    def load_stats(self) -> dict:
+        """
+        Obciążenie stacji: liczba otwartych zamówień (w tym nierozpoczętych),
+        najdłuższe i średnie oczekiwanie otwartych oraz średni czas od złożenia
+        do wydania zamówień wydanych w ostatnich LOAD_WINDOW sekundach.
+        """
+        now = time.time()
+        with self._lock:
+            waits = [now - order.created_ts for order in self._orders.values()]
+            waiting = sum(
+                order.status == StatusOrder.ORDER for order in self._orders.values()
+            )
+            while self._ready_waits and self._ready_waits[0][0] < now - LOAD_WINDOW:
+                self._ready_waits.popleft()
+            recent = [wait for _, wait in self._ready_waits]
+        return {
+            "queue_length": len(waits),
+            "waiting": waiting,
+            "oldest_wait": round(max(waits)) if waits else None,
+            "avg_wait": round(sum(waits) / len(waits)) if waits else None,
+            "rolling_wait": round(sum(recent) / len(recent)) if recent else None,
+            "rolling_ready": len(recent),
+            "window": LOAD_WINDOW,
+        }
+
+    def check(self) -> list[str]:
+        """
+        Porównuje stan w pamięci z bazą danych.
+        Zwraca listę rozbieżności (pusta lista = stan zgodny).
+        """
+        db_orders = {o["id"]: o for o in build_orders_snapshot(self.location)}
+        with self._lock:
+            memory_orders = {pk: o.to_payload() for pk, o in self._orders.items()}
+
+        problems = []
+        for pk in db_orders.keys() - memory_orders.keys():
+            problems.append(f"Order {pk}: missing on board")
+        for pk in memory_orders.keys() - db_orders.keys():
+            problems.append(f"Order {pk}: on board but not open in database")
+        for pk in db_orders.keys() & memory_orders.keys():
+            for key, value in db_orders[pk].items():
+                if memory_orders[pk][key] != value:
+                    problems.append(f"Order {pk}: '{key}' differs")
+        return sorted(problems)
+
+
+BOARDS = {location: LiveBoard(location, GROUP_NAMES[location]) for location in Location}
+
+
+def get_board(location: Location) -> LiveBoard:
+    return BOARDS[location]
+
+
+def publish_new_order(location: Location, order_detail: dict):
+    """Dodaje zamówienie do tablicy i rozsyła je do ekranów stacji."""
+    board = get_board(location)
+    seq = board.add_order(order_detail)
+    async_to_sync(get_channel_layer().group_send)(
+        board.group_name,
+        {"type": "new_order", "order_data": order_detail, "seq": seq},
+    )
+
+
+def publish_status_update(location: Location, order_id: int, status: str):
+    """Zmienia status zamówienia na tablicy i rozsyła zmianę do ekranów stacji."""
+    board = get_board(location)
+    seq = board.set_status(order_id, status)
+    async_to_sync(get_channel_layer().group_send)(
+        board.group_name,
+        {
+            "type": "order_status_update",
+            "order_id": order_id,
+            "new_status": status,
+            "seq": seq,
+        },
+    )
+
+
+def publish_bulk_status_update(location: Location, order_ids: list[int], status: str):
+    """Jedno zbiorcze zdarzenie dla grupy zamiast osobnego na każde zamówienie."""
+    if not order_ids:
+        return
+    board = get_board(location)
+    seq = board.set_status_many(order_ids, status)
+    async_to_sync(get_channel_layer().group_send)(
+        board.group_name,
+        {
+            "type": "orders_status_update",
+            "order_ids": order_ids,
+            "new_status": status,
+            "seq": seq,
+        },
+    )
+
+
+def station_load_event(board: LiveBoard) -> dict:
+    return {"type": "station_load", **board.load_stats()}
+
+
+async def _load_feed():
+    channel_layer = get_channel_layer()
+    while True:
+        await asyncio.sleep(LOAD_FEED_INTERVAL)
+        for board in BOARDS.values():
+            if not board.is_loaded:
+                continue
+            try:
+                await channel_layer.group_send(
+                    board.group_name, station_load_event(board)
+                )
+            except Exception as e:
+                print(f"Station load feed for {board.group_name} failed: {e}")
+
+
+_load_feed_task: Optional[asyncio.Task] = None
+
+
+def start_load_feed():
+    """
+    Uruchamia (raz na proces) pętlę rozsyłającą obciążenie stacji do ekranów
+    co LOAD_FEED_INTERVAL sekund. Wołane z `connect()` konsumenta, więc
+    działa w pętli zdarzeń serwera ASGI.
+    """
+    global _load_feed_task
+    if _load_feed_task is None or _load_feed_task.done():
+        _load_feed_task = asyncio.get_running_loop().create_task(_load_feed())
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.checks import Info, Tags, Warning, register
+from django.db import connections
+
+# PRAGMA zwraca liczby zamiast nazw
+PRAGMA_NAMES = {
+    "synchronous": {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"},
+    "temp_store": {0: "DEFAULT", 1: "FILE", 2: "MEMORY"},
+}
+
+
+def effective_pragmas(connection) -> dict:
+    with connection.cursor() as cursor:
+        values = {}
+        for name in settings.SQLITE_PRAGMAS:
+            value = cursor.execute(f"PRAGMA {name}").fetchone()[0]
+            values[name] = PRAGMA_NAMES.get(name, {}).get(value, value)
+    return values
+
+
+def _same(expected, value) -> bool:
+    return str(expected).lower() == str(value).lower()
+
+
+@register(Tags.database)
+def check_sqlite_pragmas(app_configs, databases=None, **kwargs):
+    """
+    Raportuje pragmy połączeń SQLite (przy `migrate` i `check --database`)
+    i ostrzega, gdy `default` nie działa z SQLITE_PRAGMAS z ustawień.
+    """
+    messages = []
+    for alias in databases or []:
+        connection = connections[alias]
+        if connection.vendor != "sqlite" or connection.is_in_memory_db():
+            continue
+        values = effective_pragmas(connection)
+        summary = ", ".join(f"{name}={value}" for name, value in values.items())
+        messages.append(
+            Info(
+                f"SQLite '{alias}': {summary}, "
+                f"transaction_mode={connection.transaction_mode}, "
+                f"CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']}",
+                id="order.I001",
+            )
+        )
+        if alias != "default":
+            continue
+        for name, expected in settings.SQLITE_PRAGMAS.items():
+            if not _same(expected, values[name]):
+                messages.append(
+                    Warning(
+                        f"SQLite '{alias}': {name}={values[name]}, "
+                        f"expected {expected}",
+                        hint="Check DATABASES OPTIONS init_command.",
+                        id="order.W001",
+                    )
+                )
+    return messages
@@ -0,0 +1,135 @@
+import csv
+import json
+from datetime import date
+from itertools import islice
+from typing import AsyncIterator, Iterator
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from order.models import Bill
+from order.raport import day_bounds_local
+from order.summary import sold_lines
+
+# ile wierszy czytamy z bazy naraz - pamięć nie zależy od długości okresu
+CHUNK_SIZE = 500
+
+BILL_COLUMNS = [
+    "id",
+    "created_at",
+    "closed_at",
+    "status",
+    "tables",
+    "waiter",
+    "payment_method",
+    "discount",
+    "subtotal",
+    "cost_discount",
+    "total_with_discount",
+]
+CHECKOUT_COLUMNS = ["id_checkout", "name", "quantity", "total_cost"]
+
+
+def _range(start: date, end: date):
+    return day_bounds_local(start)[0], day_bounds_local(end)[1]
+
+
+def bill_rows(start: date, end: date) -> Iterator[dict]:
+    """Rachunki otwarte w okresie, czytane porcjami po CHUNK_SIZE."""
+    bills = (
+        Bill.objects.filter(created_at__range=_range(start, end))
+        .select_related("service__user")
+        .prefetch_related("table")
+        .order_by("pk")
+    )
+    for bill in bills.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            "id": bill.pk,
+            "created_at": timezone.localtime(bill.created_at).isoformat(),
+            "closed_at": (
+                timezone.localtime(bill.closed_at).isoformat() if bill.closed_at else ""
+            ),
+            "status": bill.status,
+            "tables": bill.str_tables(),
+            "waiter": bill.service.user.username if bill.service else "",
+            "payment_method": bill.payment_method,
+            "discount": bill.discount,
+            "subtotal": bill.subtotal,
+            "cost_discount": bill.cost_discount,
+            "total_with_discount": bill.total_with_discount,
+        }
+
+
+def checkout_rows(start: date, end: date) -> Iterator[dict]:
+    """
+    Ilości i wartość sprzedaży (przed rabatem) wg id_checkout w okresie.
+    Dwa zapytania grupujące; liczba wierszy zależy od menu, nie od okresu.
+    """
+    lines = sold_lines(
+        ("id_checkout",), order__bill__created_at__range=_range(start, end)
+    )
+    for line in sorted(lines, key=lambda line: line["id_checkout"]):
+        yield {column: line[column] for column in CHECKOUT_COLUMNS}
+
+
+EXPORTS = {
+    "bills": (BILL_COLUMNS, bill_rows),
+    "checkout": (CHECKOUT_COLUMNS, checkout_rows),
+}
+
+
+class Echo:
+    """Bufor dla csv.writer, który zamiast zapisywać zwraca linię."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns: list[str], rows: Iterator[dict]) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row[c] for c in columns])
+
+
+def jsonl_lines(columns: list[str], rows: Iterator[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps({c: row[c] for c in columns}, default=str) + "\n"
+
+
+FORMATS = {
+    "csv": ("text/csv", csv_lines),
+    "jsonl": ("application/x-ndjson", jsonl_lines),
+}
+
+
+async def async_lines(lines: Iterator[str]) -> AsyncIterator[str]:
+    """
+    Linie eksportu dla serwera ASGI: każda porcja CHUNK_SIZE linii (i zapytania
+    ORM pod spodem) w wątku żądania. Synchroniczny iterator StreamingHttpResponse
+    pod ASGI zebrałby cały eksport w pamięci przed wysłaniem pierwszego bajtu.
+    """
+    next_chunk = sync_to_async(
+        lambda: "".join(islice(lines, CHUNK_SIZE)), thread_sensitive=True
+    )
+    while chunk := await next_chunk():
+        yield chunk
+
+
+def export_response(
+    kind: str, fmt: str, start: date, end: date, asynchronous: bool = False
+):
+    """
+    Strumieniuje eksport `kind` w formacie `fmt` wiersz po wierszu.
+    `asynchronous` - żądanie przez ASGI (treść jako iterator asynchroniczny).
+    """
+    columns, rows = EXPORTS[kind]
+    content_type, lines = FORMATS[fmt]
+    content = lines(columns, rows(start, end))
+    if asynchronous:
+        content = async_lines(content)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    filename = f"{kind}_{start.isoformat()}_{end.isoformat()}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test.utils import override_settings
+
+from menu.models import Item, Location, MenuType
+from service.models import Table
+from worker.models import Worker
+
+# pomiar nie może wysyłać zamówień na ekrany stacji na sali
+BENCH_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+@contextmanager
+def scratch_database(options: dict | None = None, alias: str = "default"):
+    """
+    Na czas pomiaru `alias` wskazuje na pustą bazę w katalogu tymczasowym
+    (schemat wprost z modeli, jak w testach), usuwaną na końcu - produkcyjny plik nie jest
+    czytany ani zmieniany. `options` zastępują OPTIONS połączenia (np. profil
+    bez pragm do porównania). Plik, a nie :memory:, bo połączenia z innych
+    wątków muszą widzieć te same dane.
+    """
+    connection = connections[alias]
+    settings_dict = connection.settings_dict
+    saved_test, saved_options = settings_dict["TEST"], settings_dict["OPTIONS"]
+    with tempfile.TemporaryDirectory(prefix="gastroflow-bench-") as directory:
+        settings_dict["TEST"] = {
+            **saved_test,
+            "NAME": os.path.join(directory, "bench.sqlite3"),
+        }
+        if options is not None:
+            settings_dict["OPTIONS"] = options
+        with override_settings(
+            CHANNEL_LAYERS=BENCH_CHANNEL_LAYERS,
+            MIGRATION_MODULES={app.label: None for app in apps.get_app_configs()},
+        ):
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                yield
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                settings_dict["TEST"] = saved_test
+                settings_dict["OPTIONS"] = saved_options
+
+
+def bench_menu() -> dict:
+    """Kelner, dwa stoliki, danie, napój i dodatek do danych pomiaru."""
+    user = User.objects.create(username="bench")
+    return {
+        "worker": Worker.objects.create(user=user),
+        "tables": [Table.objects.create(name=str(i), x=0, y=0) for i in (1, 2)],
+        "dish": Item.objects.create(
+            name="Jajecznica", id_checkout=5, price=Decimal("20.50")
+        ),
+        "drink": Item.objects.create(
+            name="Kawa",
+            id_checkout=7,
+            price=Decimal("9.00"),
+            menu=MenuType.DRINK,
+            preparation_location=Location.BAR,
+        ),
+        "addition": Item.objects.create(
+            name="Boczek", id_checkout=17, price=Decimal("3.00"), menu=MenuType.OTHER
+        ),
+    }
+
+
+def cart_line(item: Item, quantity: int = 1, additions=()) -> dict:
+    """Pozycja koszyka w postaci, jaką `do_order` przekazuje do `create_order`."""
+    return {
+        "item_id": item.id,
+        "name": item.name,
+        "price": str(item.price),
+        "quantity": quantity,
+        "note": "",
+        "category": item.preparation_location,
+        "additions": [
+            {"id": a.id, "name": a.name, "price": str(a.price)} for a in additions
+        ],
+    }
+
+
+def percentile(samples: list[float], p: float) -> float:
+    """Percentyl metodą najbliższej pozycji (`p` w procentach)."""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def median_ms(fn, repeat: int) -> float:
+    """Mediana czasu `repeat` wywołań `fn()` w milisekundach."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return 1000 * percentile(samples, 50)
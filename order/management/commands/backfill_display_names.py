@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from order.models import OrderItem
+
+
+class Command(BaseCommand):
+    help = "Fill OrderItem.display_name for items ordered before the column existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                OrderItem.objects.filter(display_name="", pk__gt=last_pk)
+                .prefetch_related("order_item_additions")
+                .order_by("pk")[:batch_size]
+            )
+            if not batch:
+                break
+            for item in batch:
+                item.display_name = OrderItem.build_full_name(
+                    item.name_snapshot,
+                    (a.name_snapshot for a in item.order_item_additions.all()),
+                )
+            with transaction.atomic():
+                OrderItem.objects.bulk_update(batch, ["display_name"])
+            updated += len(batch)
+            last_pk = batch[-1].pk
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"Updated {updated} order items")
+        self.stdout.write(self.style.SUCCESS(f"Done, {updated} order items updated."))
@@ -0,0 +1,132 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from menu.models import Location
+from order.management.bench import bench_menu, median_ms, scratch_database
+from order.models import (
+    Bill,
+    Order,
+    OrderItem,
+    OrderItemAddition,
+    PaymentMethod,
+    StatusBill,
+    StatusOrder,
+)
+from order.raport import daily_summary
+
+
+def seed_closed_bills(count: int, menu: dict, rnd: random.Random) -> Decimal:
+    """
+    Zamknięte dziś rachunki: zamówienie kuchni i baru po dwie pozycje, co
+    trzecia z dodatkiem. Wstawiane zbiorczo, sumy rachunków liczone tutaj.
+    Zwraca ich łączny przychód.
+    """
+    now = timezone.now()
+    dish, drink, addition = menu["dish"], menu["drink"], menu["addition"]
+    plans = []
+    for _ in range(count):
+        lines = [
+            (item, rnd.randint(1, 3), rnd.random() < 1 / 3)
+            for item in (dish, dish, drink, drink)
+        ]
+        bill = Bill(
+            service=menu["worker"],
+            status=StatusBill.CLOSED,
+            closed_at=now,
+            discount=rnd.choice([0, 0, 10]),
+            payment_method=rnd.choice([PaymentMethod.CASH, PaymentMethod.CARD]),
+        )
+        bill.set_totals(
+            sum(
+                (item.price + (addition.price if added else 0)) * quantity
+                for item, quantity, added in lines
+            )
+        )
+        plans.append((bill, lines))
+
+    with transaction.atomic():
+        Bill.objects.bulk_create([bill for bill, _ in plans])
+        orders = Order.objects.bulk_create(
+            [
+                Order(
+                    bill=bill,
+                    category=category,
+                    status=StatusOrder.READY,
+                    preparing_at=now,
+                    readied_at=now + timedelta(minutes=rnd.randint(3, 30)),
+                )
+                for bill, _ in plans
+                for category in (Location.KITCHEN, Location.BAR)
+            ]
+        )
+        lines = [line for _, bill_lines in plans for line in bill_lines]
+        items = OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=orders[i // 2],
+                    menu_item=item,
+                    name_snapshot=item.name,
+                    price_snapshot=item.price,
+                    quantity=quantity,
+                )
+                for i, (item, quantity, _) in enumerate(lines)
+            ]
+        )
+        OrderItemAddition.objects.bulk_create(
+            [
+                OrderItemAddition(
+                    order_item=order_item,
+                    addition=addition,
+                    name_snapshot=addition.name,
+                    price_snapshot=addition.price,
+                )
+                for order_item, (_, _, added) in zip(items, lines)
+                if added
+            ]
+        )
+    return sum((bill.total_with_discount for bill, _ in plans), Decimal("0.00"))
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the live daily report (order.raport.daily_summary) on "
+        "synthetic days of 200, 2,000 and 20,000 bills on a temporary database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="200,2000,20000",
+            help="Comma-separated bill counts (default: 200,2000,20000)",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Reports per size (median)"
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options["sizes"].split(","))
+        rnd = random.Random(16)
+        today = timezone.localdate()
+        with scratch_database():
+            menu = bench_menu()
+            self.stdout.write(f"{'bills':>6} {'statements':>11} {'ms':>9}")
+            seeded, revenue = 0, Decimal("0.00")
+            for size in sizes:
+                # kolejne rozmiary dokładają rachunki do tego samego dnia
+                revenue += seed_closed_bills(size - seeded, menu, rnd)
+                seeded = size
+                with CaptureQueriesContext(connection) as queries:
+                    report = daily_summary(today)
+                if (report["bills"]["closed"], report["revenue"]) != (size, revenue):
+                    raise CommandError(
+                        f"Report counted {report['bills']['closed']} bills, "
+                        f"{report['revenue']} revenue; seeded {size}, {revenue}"
+                    )
+                ms = median_ms(lambda: daily_summary(today), options["repeat"])
+                self.stdout.write(f"{size:>6} {len(queries):>11} {ms:>9.2f}")
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from menu.models import Location
+from order.management.bench import bench_menu, cart_line, median_ms, scratch_database
+from order.models import Bill
+from service.views import create_order
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark order ingestion (service.views.create_order) over cart sizes "
+        "1-50 on a temporary database: SQL statements and median time per order"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1,2,5,12,25,50",
+            help="Comma-separated cart sizes (default: 1,2,5,12,25,50)",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Orders per cart size"
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        with scratch_database():
+            menu = bench_menu()
+            bill = Bill.objects.create(service=menu["worker"])
+            bill.occupy_tables([table.id for table in menu["tables"]])
+            sender, tables = menu["worker"].user.username, bill.str_tables()
+
+            def ingest(items):
+                create_order(bill, items, sender, tables, category=Location.KITCHEN)
+
+            # pierwsze zamówienie tworzy też wiersz HourlyThroughput godziny
+            ingest([cart_line(menu["dish"])])
+
+            self.stdout.write(
+                f"{'cart':>5} {'statements':>11} {'ms':>8} {'ms/item':>8}"
+            )
+            for size in sizes:
+                items = [
+                    cart_line(menu["dish"], quantity=2, additions=[menu["addition"]])
+                    for _ in range(size)
+                ]
+                with CaptureQueriesContext(connection) as queries:
+                    ingest(items)
+                ms = median_ms(lambda: ingest(items), options["repeat"])
+                self.stdout.write(
+                    f"{size:>5} {len(queries):>11} {ms:>8.2f} {ms / size:>8.3f}"
+                )
@@ -0,0 +1,84 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from kitchen.consumers import OrderConsumer
+from menu.models import Location
+from order.management.bench import bench_menu, cart_line, percentile, scratch_database
+from order.models import Bill, Order, StatusOrder
+from service.views import create_order
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark N single 'ready' station actions against one batch of N "
+        "(BaseConsumer.update_order_status vs update_orders_status) on a "
+        "temporary database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--counts",
+            default="1,5,20,50",
+            help="Comma-separated numbers of orders per action (default: 1,5,20,50)",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Runs per count (median)"
+        )
+
+    def handle(self, *args, **options):
+        counts = [int(count) for count in options["counts"].split(",")]
+        consumer = OrderConsumer()
+        with scratch_database():
+            menu = bench_menu()
+            bill = Bill.objects.create(service=menu["worker"])
+            bill.occupy_tables([table.id for table in menu["tables"]])
+            items = [
+                cart_line(menu["dish"], additions=[menu["addition"]]),
+                cart_line(menu["dish"], quantity=2),
+            ]
+
+            def new_orders(count) -> list[int]:
+                for _ in range(count):
+                    create_order(bill, items, "bench", "1", category=Location.KITCHEN)
+                return list(
+                    Order.objects.filter(status=StatusOrder.ORDER)
+                    .order_by("-id")
+                    .values_list("id", flat=True)[:count]
+                )
+
+            def single(order_ids):
+                for order_id in order_ids:
+                    consumer.update_order_status(order_id, StatusOrder.READY)
+
+            def batch(order_ids):
+                consumer.update_orders_status(order_ids, StatusOrder.READY)
+
+            self.stdout.write(
+                f"{'orders':>6} {'single q':>9} {'single ms':>10} "
+                f"{'batch q':>8} {'batch ms':>9}"
+            )
+            for count in counts:
+                results = []
+                for action in (single, batch):
+                    samples = []
+                    for _ in range(options["repeat"]):
+                        order_ids = new_orders(count)
+                        # log zapytań ma limit, a liczy się tylko ta akcja
+                        connection.queries_log.clear()
+                        # konsument drukuje każdą zmianę statusu
+                        with redirect_stdout(io.StringIO()):
+                            with CaptureQueriesContext(connection) as queries:
+                                started = time.perf_counter()
+                                action(order_ids)
+                                samples.append(time.perf_counter() - started)
+                    results.append((len(queries), 1000 * percentile(samples, 50)))
+                (single_q, single_ms), (batch_q, batch_ms) = results
+                self.stdout.write(
+                    f"{count:>6} {single_q:>9} {single_ms:>10.2f} "
+                    f"{batch_q:>8} {batch_ms:>9.2f}"
+                )
@@ -0,0 +1,139 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count, Sum
+
+from menu.models import Location
+from order.management.bench import bench_menu, percentile, scratch_database
+from order.models import Bill, Order, OrderItem
+
+# profile połączenia do porównania: ustawienia z settings.py i goły backend
+# (bez pragm, tryb dziennika DELETE, transakcje DEFERRED) sprzed ich strojenia
+PROFILES = {
+    "tuned": lambda: settings.DATABASES["default"]["OPTIONS"],
+    "plain": lambda: {},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark concurrent write transactions against SQLite on a temporary "
+        "database: writer threads (read a bill, insert an order, update the "
+        "bill) next to threads running aggregate reads. Reports committed and "
+        "locked transactions, throughput and commit latency p50/p99"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profile",
+            choices=sorted(PROFILES),
+            default="tuned",
+            help="tuned: OPTIONS from settings; plain: bare sqlite3 backend",
+        )
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--transactions", type=int, default=100, help="Per writer")
+        parser.add_argument("--readers", type=int, default=2)
+        parser.add_argument(
+            "--pause-ms",
+            type=float,
+            default=0,
+            help="Pause of each writer between transactions (0: saturate)",
+        )
+        parser.add_argument(
+            "--bills", type=int, default=2000, help="Bills seeded first"
+        )
+        parser.add_argument(
+            "--no-retry",
+            action="store_true",
+            help="Drop a transaction that fails with 'database is locked' "
+            "instead of retrying it; latency then covers only the survivors",
+        )
+
+    def handle(self, *args, **options):
+        with scratch_database(options=PROFILES[options["profile"]]()):
+            menu = bench_menu()
+            Bill.objects.bulk_create(
+                [Bill(service=menu["worker"]) for _ in range(options["bills"])]
+            )
+            bill_ids = list(Bill.objects.values_list("id", flat=True)[:200])
+            connection.close()
+            self.run(bill_ids, options)
+
+    def run(self, bill_ids: list[int], options: dict):
+        latencies, locked = [], [0]
+        lock = threading.Lock()
+        stop = threading.Event()
+        pause = options["pause_ms"] / 1000
+
+        def write(i):
+            with transaction.atomic():
+                bill = Bill.objects.get(pk=bill_ids[i % len(bill_ids)])
+                Order.objects.create(bill=bill, category=Location.KITCHEN)
+                Bill.objects.filter(pk=bill.pk).update(discount=i % 50)
+
+        def writer():
+            try:
+                for i in range(options["transactions"]):
+                    # opóźnienie od pierwszej próby do commitu, z ponowieniami
+                    started = time.perf_counter()
+                    while True:
+                        try:
+                            write(i)
+                        except OperationalError:
+                            with lock:
+                                locked[0] += 1
+                            if options["no_retry"]:
+                                break
+                            continue
+                        with lock:
+                            latencies.append(time.perf_counter() - started)
+                        break
+                    time.sleep(pause)
+            finally:
+                connection.close()
+
+        def reader():
+            try:
+                while not stop.is_set():
+                    list(
+                        OrderItem.objects.values("order__category").annotate(
+                            sold=Sum("quantity"), items=Count("id")
+                        )
+                    )
+            finally:
+                connection.close()
+
+        readers = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        writers = [threading.Thread(target=writer) for _ in range(options["writers"])]
+        for thread in readers:
+            thread.start()
+        started = time.perf_counter()
+        for thread in writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+        total = options["writers"] * options["transactions"]
+        self.stdout.write(
+            f"profile {options['profile']}, {options['writers']} writers x "
+            f"{options['transactions']}, {options['readers']} readers, "
+            f"pause {options['pause_ms']:g} ms"
+            + (", no retry" if options["no_retry"] else "")
+        )
+        self.stdout.write(
+            f"committed {len(latencies)}/{total}, locked attempts {locked[0]}, "
+            f"{len(latencies) / elapsed:.0f} tx/s"
+        )
+        if latencies:
+            p50, p99 = (1000 * percentile(latencies, p) for p in (50, 99))
+            self.stdout.write(
+                f"commit latency p50 {p50:.1f} ms, p99 {p99:.1f} ms, "
+                f"max {1000 * max(latencies):.1f} ms"
+            )
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from order.models import Bill
+from order.report_cache import invalidate_days
+from order.rollup import bill_days, refresh_days
+from order.summary import bill_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute bill totals from order items and report drift of saved columns"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--fix", action="store_true", help="Overwrite drifted totals"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        checked = 0
+        drifted = []
+        last_pk = 0
+        while True:
+            batch = list(
+                Bill.objects.filter(pk__gt=last_pk).order_by("pk")[:batch_size]
+            )
+            if not batch:
+                break
+            summaries = bill_summaries(batch)
+            for bill in batch:
+                expected = Bill(discount=bill.discount)
+                expected.set_totals(summaries[bill.pk]["total"])
+                diffs = [
+                    f"{field} {getattr(bill, field)} != {getattr(expected, field)}"
+                    for field in Bill.TOTAL_FIELDS
+                    if getattr(bill, field) != getattr(expected, field)
+                ]
+                if diffs:
+                    if options["verbosity"] >= 1:
+                        self.stdout.write(f"Bill {bill.pk}: " + ", ".join(diffs))
+                    bill.set_totals(expected.subtotal)
+                    drifted.append(bill)
+            checked += len(batch)
+            last_pk = batch[-1].pk
+
+        if drifted and options["fix"]:
+            with transaction.atomic():
+                Bill.objects.bulk_update(
+                    drifted, Bill.TOTAL_FIELDS, batch_size=batch_size
+                )
+            # bulk_update pomija sygnały - fakty dni (i raporty w cache)
+            # policzone z błędnych sum przeliczamy tutaj
+            days = sorted(set().union(*(bill_days(bill) for bill in drifted)))
+            refresh_days(days)
+            invalidate_days(days)
+            self.stdout.write(
+                self.style.SUCCESS(f"Fixed {len(drifted)} of {checked} bills.")
+            )
+        elif drifted:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{len(drifted)} of {checked} bills drifted, run with --fix."
+                )
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(f"All {checked} bills match."))
@@ -0,0 +1,97 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from order.models import (
+    Bill,
+    Location,
+    Notification,
+    NotificationStatus,
+    Order,
+    OrderItem,
+    StatusBill,
+    StatusOrder,
+)
+from order.raport import day_bounds_local
+from order.snapshots import OPEN_ORDER_STATUSES, ORDER_ITEM_ORDERING
+
+# zapytania o stan otwarty (kilka-kilkadziesiąt wierszy) - tu sam `status=?`
+# w indeksie wystarcza; w pozostałych oznacza przejście całej historii
+OPEN_STATE_QUERIES = {"waiting notifications", "open bills"}
+
+
+def hot_queries() -> dict:
+    """
+    Najczęstsze zapytania (ekrany stacji, powiadomienia kelnera, rachunki,
+    raporty) w postaci, w jakiej wysyłają je widoki i konsumenci.
+    """
+    bounds = day_bounds_local(timezone.localdate())
+    start, end = bounds
+    return {
+        "open orders (station board)": Order.objects.filter(
+            status__in=OPEN_ORDER_STATUSES, category=Location.KITCHEN
+        ).order_by("created_at"),
+        "station history": Order.objects.filter(
+            status=StatusOrder.READY,
+            category=Location.KITCHEN,
+            created_at__range=bounds,
+        ).order_by("-created_at", "-id"),
+        "order items by name": OrderItem.objects.filter(order_id__in=[1, 2]).order_by(
+            *ORDER_ITEM_ORDERING
+        ),
+        "waiting notifications": Notification.objects.filter(
+            status=NotificationStatus.WAIT
+        ).order_by("last_update"),
+        "open bills": Bill.objects.filter(status=StatusBill.OPEN),
+        "bills of day": Bill.objects.filter(created_at__range=bounds),
+        "bills opened or closed on day": Bill.objects.filter(
+            Q(created_at__range=(start, end))
+            | Q(status=StatusBill.CLOSED, closed_at__range=(start, end))
+        ),
+    }
+
+
+def full_scans(plan: str, table: str, status_only: bool = False) -> list[str]:
+    """
+    Wiersze planu z pełnym przejściem tabeli (`SCAN tabela` bez indeksu)
+    oraz - gdy nie `status_only` - z wyszukiwaniem tylko po `status=?`,
+    które przy statusach historycznych czyta prawie całą tabelę.
+    """
+    table = re.escape(table)
+    patterns = [re.compile(rf"\bSCAN {table}\b(?! USING)")]
+    if not status_only:
+        patterns.append(
+            re.compile(rf"\bSEARCH {table} USING (COVERING )?INDEX \S+ \(status=\?\)")
+        )
+    return [
+        line.strip()
+        for line in plan.splitlines()
+        if any(pattern.search(line) for pattern in patterns)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Print EXPLAIN QUERY PLAN of hot order/notification/bill queries "
+        "and fail when any of them scans the whole table (or searches "
+        "history by status alone)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, queryset in hot_queries().items():
+            queryset = queryset.using(options["database"])
+            plan = queryset.explain()
+            self.stdout.write(f"{name}:\n{plan}\n")
+            table = queryset.model._meta.db_table
+            if full_scans(plan, table, status_only=name in OPEN_STATE_QUERIES):
+                failed.append(name)
+
+        if failed:
+            raise CommandError("Full table scan in: " + ", ".join(failed))
+        self.stdout.write(self.style.SUCCESS("All hot queries use indexes."))
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from order.management.date_range import add_date_range_arguments, date_range
+from order.models import Bill
+from order.rollup import refresh_day
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute DailyFacts rows for a range of past days "
+        "(default: all history up to yesterday)"
+    )
+
+    def add_arguments(self, parser):
+        add_date_range_arguments(parser)
+
+    def handle(self, *args, **options):
+        date_from, date_to = date_range(options, Bill.objects.all())
+        # dzisiejsze fakty liczone są przy odczycie (zob. order.rollup.refresh_days)
+        date_to = min(date_to, timezone.localdate() - timedelta(days=1))
+
+        day = date_from
+        days = 0
+        while day <= date_to:
+            refresh_day(day)
+            days += 1
+            if days % 30 == 0 and options["verbosity"] >= 2:
+                self.stdout.write(f"Rebuilt {days} days (up to {day})")
+            day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f"Done, {days} days rebuilt."))
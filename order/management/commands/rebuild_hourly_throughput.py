@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from order.management.date_range import add_date_range_arguments, date_range
+from order.models import Order
+from order.throughput import rebuild_hours
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute HourlyThroughput rows from the order table for a range of days "
+        "(default: all history)"
+    )
+
+    def add_arguments(self, parser):
+        add_date_range_arguments(parser)
+
+    def handle(self, *args, **options):
+        date_from, date_to = date_range(options, Order.objects.all())
+
+        hours = rebuild_hours(date_from, date_to)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done, {hours} station-hours rebuilt ({date_from} - {date_to})."
+            )
+        )
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from order.models import StatusBill
+from service.models import Table
+
+
+class Command(BaseCommand):
+    help = "Recount open bills per table and report drift of Table.open_bills"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix", action="store_true", help="Overwrite drifted counters"
+        )
+
+    def handle(self, *args, **options):
+        tables = Table.objects.annotate(
+            open_count=Count("bill", filter=Q(bill__status=StatusBill.OPEN))
+        ).order_by("pk")
+
+        drifted = []
+        for table in tables:
+            occupied = table.open_count > 0
+            if table.open_bills != table.open_count or table.is_occupied != occupied:
+                if options["verbosity"] >= 1:
+                    self.stdout.write(
+                        f"Table {table.pk} ({table.name}): open_bills"
+                        f" {table.open_bills} != {table.open_count} or"
+                        f" is_occupied {table.is_occupied} != {occupied}"
+                    )
+                table.open_bills = table.open_count
+                table.is_occupied = occupied
+                drifted.append(table)
+
+        if drifted and options["fix"]:
+            Table.objects.bulk_update(drifted, ["open_bills", "is_occupied"])
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(drifted)} tables."))
+        elif drifted:
+            self.stdout.write(
+                self.style.WARNING(f"{len(drifted)} tables drifted, run with --fix.")
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS("All tables match."))
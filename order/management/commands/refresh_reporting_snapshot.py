@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from order.reporting import refresh_snapshot, reporting_enabled
+from order.rollup import settle_past_days
+
+
+class Command(BaseCommand):
+    help = (
+        "Store DailyFacts of past days that are still missing, then copy the "
+        "default database to the reporting snapshot (SQLite backup API)"
+    )
+
+    def handle(self, *args, **options):
+        if not reporting_enabled():
+            raise CommandError("No separate 'reporting' database configured")
+        settled = settle_past_days()
+        self.stdout.write(f"Stored facts of {settled} past days.")
+        refresh_snapshot()
+        self.stdout.write(self.style.SUCCESS("Reporting snapshot refreshed."))
@@ -0,0 +1,31 @@
+from datetime import date
+
+from django.core.management.base import CommandError
+from django.db.models import Min, QuerySet
+from django.utils import timezone
+
+
+def add_date_range_arguments(parser):
+    parser.add_argument("--from", dest="date_from", help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="YYYY-MM-DD")
+
+
+def date_range(options: dict, history: QuerySet) -> tuple[date, date]:
+    """
+    Dni z opcji --from/--to. Domyślnie od dnia pierwszego `created_at`
+    w `history` (cała historia) do dziś.
+    """
+    try:
+        date_to = (
+            date.fromisoformat(options["date_to"])
+            if options["date_to"]
+            else timezone.localdate()
+        )
+        if options["date_from"]:
+            date_from = date.fromisoformat(options["date_from"])
+        else:
+            first = history.aggregate(first=Min("created_at"))["first"]
+            date_from = timezone.localdate(first) if first else date_to
+    except ValueError as e:
+        raise CommandError(f"Wrong date: {e}")
+    return date_from, date_to
@@ -1,9 +1,11 @@
-from decimal import Decimal
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable
 
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models import DecimalField, ExpressionWrapper, F, Sum
-from django.db.models.functions import Coalesce
+from django.db import models, transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 
 from menu.models import Item, Location
@@ -56,6 +58,38 @@ class Bill(models.Model):
     payment_method = models.CharField(
         max_length=10, choices=PaymentMethod.choices, default=PaymentMethod.CARD
     )
+    # sumy utrzymywane przy każdej zmianie pozycji/rabatu
+    # (zob. add_to_subtotal, set_discount, check_bill_totals)
+    subtotal = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        help_text="Sum of items with additions, before discount",
+    )
+    cost_discount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        help_text="Discount amount",
+    )
+    total_with_discount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        help_text="Amount to pay",
+    )
+
+    TOTAL_FIELDS = ["subtotal", "cost_discount", "total_with_discount"]
+
+    class Meta:
+        # otwarte rachunki (status) i raporty po dniu otwarcia / zamknięcia
+        # (zob. manage.py check_query_plans)
+        indexes = [
+            models.Index(fields=["created_at"], name="bill_created_at_idx"),
+            models.Index(
+                fields=["status", "closed_at"], name="bill_status_closed_at_idx"
+            ),
+        ]
 
     # Payment additional
     # is_cash
@@ -69,53 +103,93 @@ class Bill(models.Model):
 
     @property
     def total(self):
-        s = self.bill_summary_view()
-        return s["total"] - s["cost_discount"]
+        return self.total_with_discount
+
+    @staticmethod
+    def discount_amount(subtotal: Decimal, discount: int) -> Decimal:
+        """Kwota rabatu zaokrąglona do groszy."""
+        return (subtotal * discount / 100).quantize(
+            Decimal("0.01"), rounding=ROUND_HALF_UP
+        )
+
+    def set_totals(self, subtotal: Decimal):
+        """Ustawia sumy w obiekcie (bez zapisu) dla podanej sumy pozycji."""
+        self.subtotal = subtotal
+        self.cost_discount = self.discount_amount(subtotal, self.discount)
+        self.total_with_discount = subtotal - self.cost_discount
+
+    def add_to_subtotal(self, amount: Decimal):
+        """
+        Dolicza kwotę (ujemną przy usuwaniu pozycji) do sum rachunku.
+        Czyta aktualny wiersz w tej samej transakcji, więc równoległe
+        zamówienia na ten sam rachunek nie nadpisują sobie sum.
+        """
+        with transaction.atomic():
+            current = (
+                Bill.objects.select_for_update()
+                .only("subtotal", "discount")
+                .get(pk=self.pk)
+            )
+            self.discount = current.discount
+            self.set_totals(current.subtotal + amount)
+            self.save(update_fields=self.TOTAL_FIELDS)
+
+    def set_discount(self, discount: int):
+        """Zmienia rabat i przelicza kwotę rabatu oraz sumę do zapłaty."""
+        with transaction.atomic():
+            current = Bill.objects.select_for_update().only("subtotal").get(pk=self.pk)
+            self.discount = discount
+            self.set_totals(current.subtotal)
+            self.save(update_fields=["discount", *self.TOTAL_FIELDS])
+
+    def close(self, payment_method: str | None = None) -> bool:
+        """
+        Zamyka rachunek warunkowym UPDATE (tylko OTWARTY) i zwalnia stoliki.
+        Przy podwójnym wysłaniu albo dwóch kelnerach zamyka tylko pierwszy;
+        pozostali dostają False i nie zwalniają stolików drugi raz.
+        """
+        from order.rollup import refresh_bill_days
+
+        fields = {"status": StatusBill.CLOSED, "closed_at": timezone.now()}
+        if payment_method is not None:
+            fields["payment_method"] = payment_method
+        with transaction.atomic():
+            closed = Bill.objects.filter(pk=self.pk, status=StatusBill.OPEN)
+            if closed.update(**fields) != 1:
+                return False
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.release_tables()
+            # UPDATE omija post_save, który przelicza fakty dni rachunku
+            refresh_bill_days(self)
+        return True
+
+    def occupy_tables(self, table_ids: Iterable[int]):
+        """Przypisuje stoliki do nowego rachunku i zajmuje je jednym UPDATE."""
+        table_ids = list(table_ids)
+        with transaction.atomic():
+            self.table.add(*table_ids)
+            Table.objects.filter(pk__in=table_ids).update(
+                open_bills=F("open_bills") + 1, is_occupied=True
+            )
 
-    def close(self):
-        self.status = StatusBill.CLOSED
-        self.closed_at = timezone.now()
-        self.save()
+    def release_tables(self):
+        """
+        Zwalnia wszystkie stoliki rachunku jednym UPDATE. Stolik zostaje zajęty,
+        jeśli ma jeszcze inne otwarte rachunki (SET liczy na starych wartościach).
+        """
+        Table.objects.filter(bill=self).update(
+            open_bills=Greatest(F("open_bills") - 1, Value(0)),
+            is_occupied=Case(
+                When(open_bills__gt=1, then=Value(True)), default=Value(False)
+            ),
+        )
 
     def bill_summary_view(self):
-        summary = {}
-        total = Decimal("0.00")
-
-        orders = self.orders.prefetch_related("order_items__order_item_additions")
-        for order in orders:
-            for item in order.order_items.all():
-                # main dish
-                summary.setdefault(
-                    item.name_snapshot,
-                    {
-                        "id": item.menu_item.id_checkout,
-                        "quantity": 0,
-                        "total_cost": Decimal("0.00"),
-                    },
-                )
-                summary[item.name_snapshot]["quantity"] += item.quantity
-                summary[item.name_snapshot]["total_cost"] += item.raw_cost
-
-                total += item.raw_cost
-
-                # check additions
-                for addition in item.order_item_additions.all():
-                    summary.setdefault(
-                        addition.name_snapshot,
-                        {
-                            "id": addition.addition.id_checkout,
-                            "quantity": 0,
-                            "total_cost": Decimal("0.00"),
-                        },
-                    )
-                    summary[addition.name_snapshot]["quantity"] += item.quantity
-                    summary[addition.name_snapshot]["total_cost"] += (
-                        addition.price_snapshot * item.quantity
-                    )
-                    total += addition.price_snapshot * item.quantity
-        cost_discount = (total * self.discount) / 100
-
-        return {"total": total, "summary": summary, "cost_discount": cost_discount}
+        """Podsumowanie rachunku liczone w SQL (zob. `order.summary`)."""
+        from order.summary import bill_summary
+
+        return bill_summary(self)
 
 
 class Order(models.Model):
@@ -133,6 +207,17 @@ class Order(models.Model):
     paid_at = models.DateTimeField(null=True, blank=True)
     canceled_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # tablica i historia stacji: status + stacja, zakres/sortowanie
+            # po created_at (indeks częściowy po statusie nie zadziała - Django
+            # przekazuje wartości IN jako parametry, a SQLite wymaga literałów)
+            models.Index(
+                fields=["status", "category", "created_at"],
+                name="order_status_cat_created_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Order {self.id}"
 
@@ -171,6 +256,14 @@ class Notification(models.Model):
     )
     last_update = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # powiadomienia kelnera: status WAIT w kolejności last_update
+        indexes = [
+            models.Index(
+                fields=["status", "last_update"], name="notif_status_last_update_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"@{self.worker} - {self.order_item.name_snapshot} | {self.order_item.order.bill.str_tables()}"
 
@@ -183,6 +276,12 @@ class OrderItem(models.Model):
     name_snapshot = models.CharField(
         max_length=150, help_text="Name of dish with additions"
     )
+    display_name = models.CharField(
+        max_length=500,
+        blank=True,
+        default="",
+        help_text="Name of dish with names of additions, saved when ordered",
+    )
     price_snapshot = models.DecimalField(
         max_digits=5, decimal_places=2, help_text="Price of dish when it was ordered"
     )
@@ -213,17 +312,26 @@ class OrderItem(models.Model):
     def total_cost(self):
         """Cost with additions"""
         additions = self.order_item_additions.aggregate(
-            additions_sum=Coalesce(Sum("price_snapshot"), 0)
+            additions_sum=Coalesce(Sum("price_snapshot"), Value(Decimal("0.00")))
         )["additions_sum"]
         return (self.price_snapshot + additions) * self.quantity
 
+    @staticmethod
+    def build_full_name(name: str, additions_names: Iterable[str]) -> str:
+        additions_names = ", ".join(additions_names)
+        if additions_names:
+            return f"{name} ({additions_names})"
+        return name
+
     @property
     def full_name_snapshot(self):
-        additions = self.order_item_additions.all()
-        if additions.exists():
-            additions_names = ", ".join(a.name_snapshot for a in additions)
-            return f"{self.name_snapshot} ({additions_names})"
-        return self.name_snapshot
+        if self.display_name:
+            return self.display_name
+        # pozycje sprzed kolumny display_name (zob. backfill_display_names)
+        return self.build_full_name(
+            self.name_snapshot,
+            (a.name_snapshot for a in self.order_item_additions.all()),
+        )
 
     def save(self, *args, **kwargs):
         is_init = self.pk is None
@@ -244,3 +352,82 @@ class OrderItemAddition(models.Model):
     addition = models.ForeignKey(Item, on_delete=models.CASCADE)
     name_snapshot = models.CharField(max_length=100)
     price_snapshot = models.DecimalField(max_digits=7, decimal_places=2)
+
+
+class DailyFacts(models.Model):
+    """
+    Fakty dnia do raportów (zob. `order.rollup`). Przeliczane dla dni
+    rachunku, gdy jest zamykany, usuwany albo zmienia się jego rabat.
+    """
+
+    date = models.DateField(unique=True)
+    bills_opened = models.PositiveIntegerField(default=0)
+    bills_closed = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00")
+    )
+    revenue_cash = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00")
+    )
+    revenue_card = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00")
+    )
+    items_sold = models.PositiveIntegerField(default=0)
+    items_by_category = models.JSONField(
+        default=dict, help_text="Quantity sold per order category"
+    )
+    prep_time_total = models.DurationField(
+        default=timedelta, help_text="Sum of kitchen preparation times"
+    )
+    prep_count = models.PositiveIntegerField(
+        default=0, help_text="Number of orders in prep_time_total"
+    )
+    checkout_quantities = models.JSONField(
+        default=dict, help_text="Quantity sold per id_checkout"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Daily facts {self.date}"
+
+
+class DailyPrepTimes(models.Model):
+    """
+    Czasy przygotowania pozycji kuchni jednego minionego dnia, pogrupowane
+    (zob. `order.prep_stats.PrepExtract`). Zapisywane, gdy wszystkie pozycje
+    dnia są gotowe; usuwane przy zmianach rachunków tego dnia.
+    """
+
+    date = models.DateField(unique=True)
+    extract = models.BinaryField(help_text="PrepExtract.to_bytes()")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Prep times {self.date}"
+
+
+class HourlyThroughput(models.Model):
+    """
+    Ruch stacji w jednej godzinie (zob. `order.throughput`). Liczniki
+    zwiększane przy tworzeniu zamówienia i przy jego wydaniu (READY).
+    """
+
+    hour = models.DateTimeField(help_text="Start of the hour")
+    category = models.CharField(choices=Location.choices)
+    orders_created = models.PositiveIntegerField(default=0)
+    orders_readied = models.PositiveIntegerField(default=0)
+    items_sold = models.PositiveIntegerField(default=0)
+    queue_time_total = models.DurationField(
+        default=timedelta,
+        help_text="Sum of created_at -> readied_at of orders readied in the hour",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hour", "category"], name="unique_hourly_throughput"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.category} {self.hour:%Y-%m-%d %H}:00"
@@ -0,0 +1,71 @@
+from typing import Iterable, Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from menu.models import Location
+from order.models import Notification, NotificationStatus
+
+NOTIFICATIONS_GROUP = "notifications"
+
+
+def notifications_queryset():
+    """Notyfikacje ze wszystkim, czego potrzebuje payload dla kelnera."""
+    return Notification.objects.select_related(
+        "worker__user", "order_item__order__bill"
+    ).prefetch_related("order_item__order__bill__table")
+
+
+def notification_payload(n: Notification, created_at=None) -> dict:
+    order_item = n.order_item
+    return {
+        "id": n.id,
+        "worker": str(n.worker),
+        "order_item": order_item.full_name_snapshot
+        + (f" ({order_item.note})" if order_item.note else ""),
+        "table": order_item.order.bill.str_tables(),
+        "created_at": (created_at or n.last_update).isoformat(),
+    }
+
+
+def broadcast_notifications(payloads: list[dict]):
+    """Jedna wiadomość `new_notifications` do kelnerów zamiast N osobnych."""
+    if not payloads:
+        return
+    async_to_sync(get_channel_layer().group_send)(
+        NOTIFICATIONS_GROUP,
+        {"type": "new_notifications", "notifications": payloads},
+    )
+
+
+def release_notifications(
+    order_ids: Optional[Iterable[int]] = None,
+    item_ids: Optional[Iterable[int]] = None,
+    category: Optional[Location] = None,
+) -> list[dict]:
+    """
+    Przestawia notyfikacje PREPARE -> WAIT dla podanych zamówień i/lub pozycji
+    i zwraca payloady gotowe do wysłania.
+    Stała liczba zapytań niezależnie od liczby pozycji.
+    """
+    qs = notifications_queryset().filter(status=NotificationStatus.PREPARE)
+    if order_ids is not None:
+        qs = qs.filter(order_item__order_id__in=list(order_ids))
+    if item_ids is not None:
+        qs = qs.filter(order_item_id__in=list(item_ids))
+    if category is not None:
+        qs = qs.filter(order_item__order__category=category)
+
+    now = timezone.now()
+    notifications = list(qs)
+    payloads = [notification_payload(n, created_at=now) for n in notifications]
+    Notification.objects.filter(
+        pk__in=[n.pk for n in notifications], status=NotificationStatus.PREPARE
+    ).update(status=NotificationStatus.WAIT, last_update=now)
+    return payloads
+
+
+def notify_orders_ready(order_ids: Iterable[int]):
+    """Zwalnia notyfikacje gotowych zamówień i wysyła je jedną wiadomością."""
+    broadcast_notifications(release_notifications(order_ids=order_ids))
@@ -0,0 +1,117 @@
+import base64
+import binascii
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from django.db.models import Q, QuerySet
+from django.http import QueryDict
+
+AFTER_PARAM = "after"
+BEFORE_PARAM = "before"
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(value: Optional[str]) -> Optional[tuple[datetime, int]]:
+    """(created_at, id) z kursora albo None, gdy brak lub zły format."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        created_at, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+@dataclass
+class KeysetPage:
+    """
+    Strona listy stronicowanej po (created_at, id) malejąco.
+    Udaje `page_obj` z ListView na tyle, na ile potrzebują szablony.
+    """
+
+    object_list: list
+    has_next: bool
+    has_previous: bool
+    query: QueryDict
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+    def _url(self, param: str, obj) -> str:
+        query = self.query.copy()
+        query.pop(AFTER_PARAM, None)
+        query.pop(BEFORE_PARAM, None)
+        query[param] = encode_cursor(obj.created_at, obj.pk)
+        return f"?{query.urlencode()}"
+
+    @property
+    def next_url(self) -> str:
+        """Starsze wpisy."""
+        return self._url(AFTER_PARAM, self.object_list[-1])
+
+    @property
+    def previous_url(self) -> str:
+        """Nowsze wpisy."""
+        return self._url(BEFORE_PARAM, self.object_list[0])
+
+
+def keyset_page(queryset: QuerySet, query: QueryDict, per_page: int) -> KeysetPage:
+    """
+    Zwraca stronę `queryset` od kursora z `?after=` (starsze) lub `?before=`
+    (nowsze). Jedno zapytanie z WHERE po (created_at, id) i LIMIT per_page + 1,
+    bez OFFSET i COUNT, więc koszt strony nie zależy od długości historii.
+    Pusta strona `?before=` (kursor na najnowszym wpisie) daje pierwszą stronę.
+    """
+    after = decode_cursor(query.get(AFTER_PARAM))
+    before = None if after else decode_cursor(query.get(BEFORE_PARAM))
+
+    if before:
+        created_at, pk = before
+        rows = list(
+            queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ).order_by("created_at", "id")[: per_page + 1]
+        )
+        if rows:
+            has_previous = len(rows) > per_page
+            rows = rows[:per_page]
+            rows.reverse()
+            return KeysetPage(
+                rows, has_next=True, has_previous=has_previous, query=query
+            )
+
+    if after:
+        created_at, pk = after
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    rows = list(queryset.order_by("-created_at", "-id")[: per_page + 1])
+    return KeysetPage(
+        rows[:per_page],
+        has_next=len(rows) > per_page,
+        has_previous=after is not None,
+        query=query,
+    )
+
+
+class KeysetPaginationMixin:
+    """
+    Dla ListView: zastępuje stronicowanie OFFSET/COUNT kursorem po
+    (created_at, id). W kontekście `page_obj` to `KeysetPage`, `paginator` None.
+    """
+
+    def paginate_queryset(self, queryset, page_size):
+        page = keyset_page(queryset, self.request.GET, page_size)
+        return None, page, page.object_list, page.has_other_pages()
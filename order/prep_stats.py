@@ -0,0 +1,258 @@
+import json
+from array import array
+from datetime import date, datetime, timedelta
+from math import floor
+
+from django.db import connections
+from django.db.models import F, FloatField, Func, Q
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from menu.models import Location
+from order.models import DailyPrepTimes, OrderItem
+from order.raport import day_bounds_local
+from order.reporting import primary_reads
+from order.snapshots import OPEN_ORDER_STATUSES
+
+PERCENTILES = {"p50": 0.50, "p90": 0.90, "p99": 0.99}
+
+# julianday() epoki uniksowej; strefy czasowe przesuwają się o wielokrotności
+# kwadransa, więc lokalny dzień/godzinę liczymy raz na kwadrans UTC
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+LOCAL_SLOT = 15 * 60
+
+
+class PrepExtract:
+    """
+    Wyciąg czasów przygotowania pozycji kuchni (w sekundach) pogrupowany
+    od razu wg pozycji menu, godziny i dnia tygodnia rozpoczęcia - jedna
+    kolumna array("d") na grupę. Łączenie dni i sortowanie grup to operacje
+    na całych kolumnach, bez pętli po wierszach. Minione dni zapisujemy
+    w `DailyPrepTimes` (`to_bytes`).
+    """
+
+    GROUPS = ("by_item", "by_hour", "by_weekday")
+    __slots__ = GROUPS
+
+    def __init__(self):
+        self.by_item: dict[str, array] = {}
+        self.by_hour: dict[int, array] = {}
+        self.by_weekday: dict[int, array] = {}
+
+    def __len__(self):
+        return sum(len(column) for column in self.by_weekday.values())
+
+    def add(self, name: str, hour: int, weekday: int, seconds: float):
+        for groups, key in (
+            (self.by_item, name),
+            (self.by_hour, hour),
+            (self.by_weekday, weekday),
+        ):
+            column = groups.get(key)
+            if column is None:
+                column = groups[key] = array("d")
+            column.append(seconds)
+
+    def extend(self, other: "PrepExtract"):
+        for group in self.GROUPS:
+            groups = getattr(self, group)
+            for key, column in getattr(other, group).items():
+                if key in groups:
+                    groups[key].extend(column)
+                else:
+                    groups[key] = array("d", column)
+
+    def seconds(self) -> array:
+        result = array("d")
+        for column in self.by_weekday.values():
+            result.extend(column)
+        return result
+
+    def to_bytes(self) -> bytes:
+        """Nagłówek JSON (klucze i długości kolumn), potem posortowane kolumny."""
+        header, body = {}, array("d")
+        for group in self.GROUPS:
+            header[group] = []
+            for key, column in getattr(self, group).items():
+                header[group].append([key, len(column)])
+                # posortowane serie łączonych dni sortują się prawie liniowo
+                body.extend(sorted(column))
+        head = json.dumps(header).encode()
+        return len(head).to_bytes(4, "little") + head + body.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "PrepExtract":
+        data = bytes(data)
+        size = int.from_bytes(data[:4], "little")
+        header = json.loads(data[4 : 4 + size])
+        body = array("d")
+        body.frombytes(data[4 + size :])
+        extract, offset = cls(), 0
+        for group in cls.GROUPS:
+            groups = getattr(extract, group)
+            for key, length in header[group]:
+                groups[key] = body[offset : offset + length]
+                offset += length
+        return extract
+
+
+def _julianday(field: str) -> Func:
+    return Func(F(field), function="julianday", output_field=FloatField())
+
+
+def _seconds(expression) -> Round:
+    # funkcje czasu SQLite mają rozdzielczość milisekund
+    return Round(expression * 86400, precision=3, output_field=FloatField())
+
+
+def _load_extracts(start: date, end: date) -> tuple[dict[date, PrepExtract], set]:
+    """
+    Wyciągi dni [start, end] jednym zapytaniem, podzielone na dni, oraz dni
+    z pozycjami jeszcze w przygotowaniu (otwarte zamówienia bez finished_at).
+    Z bazy bieżącego kontekstu (kopia raportowa w widoku raportu).
+    """
+    extracts = {}
+    unfinished = set()
+    # sekundy od epoki i czas przygotowania liczy SQLite - bez konwersji
+    # dwóch datetime (i strefy czasowej) na każdy wiersz
+    rows = (
+        OrderItem.objects.filter(
+            Q(finished_at__isnull=False) | Q(order__status__in=OPEN_ORDER_STATUSES),
+            order__category=Location.KITCHEN,
+            started_at__range=(day_bounds_local(start)[0], day_bounds_local(end)[1]),
+        )
+        .order_by()
+        .values_list(
+            "name_snapshot",
+            _seconds(_julianday("started_at") - UNIX_EPOCH_JULIAN_DAY),
+            _seconds(_julianday("finished_at") - _julianday("started_at")),
+        )
+    )
+    tz = timezone.get_current_timezone()
+    local_slots = {}
+    # wartości to już float/str, więc czytamy kursorem z pominięciem
+    # konwerterów ORM (ich koszt na wiersz był większy niż samej pętli)
+    sql, params = rows.query.sql_with_params()
+    with connections[rows.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        for name, started, seconds in cursor:
+            slot = int(started // LOCAL_SLOT)
+            local = local_slots.get(slot)
+            if local is None:
+                moment = datetime.fromtimestamp(slot * LOCAL_SLOT, tz)
+                day = moment.date()
+                if day not in extracts:
+                    extracts[day] = PrepExtract()
+                local = local_slots[slot] = (
+                    day,
+                    moment.hour,
+                    moment.weekday(),
+                    extracts[day],
+                )
+            day, hour, weekday, extract = local
+            if seconds is None:
+                unfinished.add(day)
+                continue
+            extract.add(name, hour, weekday, seconds)
+    return extracts, unfinished
+
+
+def prep_extract(start: date, end: date) -> PrepExtract:
+    """
+    Wyciąg okresu [start, end]. Dni zapisane w `DailyPrepTimes` (wiersz na
+    dzień) są tylko doklejane, brakujące liczone w pamięci jednym zapytaniem
+    od pierwszego brakującego dnia - odczyt niczego nie zapisuje.
+    """
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    extracts = {
+        row.date: PrepExtract.from_bytes(row.extract)
+        for row in DailyPrepTimes.objects.filter(date__range=(start, end))
+    }
+
+    missing = [day for day in days if day not in extracts]
+    if missing:
+        loaded, _ = _load_extracts(missing[0], missing[-1])
+        for day in missing:
+            extracts[day] = loaded.get(day, PrepExtract())
+
+    result = PrepExtract()
+    for day in days:
+        result.extend(extracts[day])
+    return result
+
+
+@primary_reads()
+def store_prep_days(start: date, end: date) -> int:
+    """
+    Zapisuje w `DailyPrepTimes` brakujące minione dni [start, end] bez pozycji
+    w przygotowaniu. Poza żądaniem (zob. `settle_past_days`), z `default`.
+    Zwraca liczbę zapisanych dni.
+    """
+    end = min(end, timezone.localdate() - timedelta(days=1))
+    stored = set(
+        DailyPrepTimes.objects.filter(date__range=(start, end)).values_list(
+            "date", flat=True
+        )
+    )
+    days = (start + timedelta(days=i) for i in range((end - start).days + 1))
+    missing = [day for day in days if day not in stored]
+    settled = []
+    # jedno zapytanie na ciągły odcinek brakujących dni - pojedynczy dzień
+    # unieważniony w starej historii nie wczytuje wszystkiego do dziś
+    while missing:
+        run = 1
+        while run < len(missing) and missing[run] == missing[0] + timedelta(days=run):
+            run += 1
+        days, missing = missing[:run], missing[run:]
+        loaded, unfinished = _load_extracts(days[0], days[-1])
+        # pozycja rozpoczęta przed północą i skończona po niej dołączy
+        # do wyciągu dnia dopiero po zakończeniu
+        settled.extend(
+            DailyPrepTimes(date=day, extract=loaded.get(day, PrepExtract()).to_bytes())
+            for day in days
+            if day not in unfinished
+        )
+    DailyPrepTimes.objects.bulk_create(
+        settled,
+        update_conflicts=True,
+        unique_fields=["date"],
+        update_fields=["extract", "updated_at"],
+    )
+    return len(settled)
+
+
+def invalidate_prep_days(start: date, end: date):
+    """Usuwa zapisane wyciągi dni [start, end] (zmiana lub usunięcie pozycji)."""
+    DailyPrepTimes.objects.filter(date__range=(start, end)).delete()
+
+
+def percentiles(values: list[float]) -> dict:
+    """p50/p90/p99 z interpolacją liniową (jak numpy.percentile)."""
+    values = sorted(values)
+    result = {"count": len(values)}
+    for label, q in PERCENTILES.items():
+        k = (len(values) - 1) * q
+        f = floor(k)
+        c = min(f + 1, len(values) - 1)
+        result[label] = values[f] + (values[c] - values[f]) * (k - f)
+    return result
+
+
+def _grouped(groups: dict) -> dict:
+    return {key: percentiles(values) for key, values in sorted(groups.items())}
+
+
+def prep_time_percentiles(start: date, end: date) -> dict:
+    """
+    Percentyle czasu przygotowania (finished_at - started_at, w sekundach)
+    pozycji kuchni w okresie: wg pozycji menu, godziny i dnia tygodnia
+    (0 = poniedziałek) rozpoczęcia.
+    """
+    extract = prep_extract(start, end)
+    return {
+        "count": len(extract),
+        "overall": percentiles(extract.seconds()) if len(extract) else None,
+        "by_item": _grouped(extract.by_item),
+        "by_hour": _grouped(extract.by_hour),
+        "by_weekday": _grouped(extract.by_weekday),
+    }
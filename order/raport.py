@@ -1,13 +1,29 @@
 # reports/services.py
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 
-from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Sum
-from django.db.models.functions import Coalesce
+from django.db.models import (
+    Count,
+    DurationField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Sum,
+)
 from django.utils import timezone
 
 from menu.models import MenuType
-from order.models import Bill, Location, Order, OrderItem, PaymentMethod, StatusBill
+from order.models import (
+    Bill,
+    Location,
+    Order,
+    OrderItem,
+    PaymentMethod,
+    StatusBill,
+)
+from order.summary import sold_lines
 
 
 def day_bounds_local(date):
@@ -20,101 +36,138 @@ def day_bounds_local(date):
     return start, end
 
 
-def daily_summary(date=None):
+def period_bounds(period: str, anchor):
     """
-    Główny raport dzienny. Zwraca słownik z KPI.
-    Domyślnie: dzisiaj (wg Europe/Warsaw).
+    Pierwszy i ostatni dzień tygodnia (pon-niedz) lub miesiąca zawierającego
+    `anchor`; dla innych wartości `period` - sam dzień.
     """
-    if date is None:
-        date = timezone.localdate()
+    if period == "week":
+        start = anchor - timedelta(days=anchor.weekday())
+        return start, start + timedelta(days=6)
+    if period == "month":
+        start = anchor.replace(day=1)
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        return start, next_month - timedelta(days=1)
+    return anchor, anchor
+
 
+def day_facts(date) -> dict:
+    """
+    Fakty jednego dnia w postaci pól `DailyFacts`.
+    Pięć zapytań niezależnie od liczby rachunków i pozycji.
+    """
     start, end = day_bounds_local(date)
 
-    # 1) Rachunki otwarte/zamknięte tego dnia
-    bills_opened = Bill.objects.filter(created_at__range=(start, end)).count()
-    bills_closed = Bill.objects.filter(
-        status=StatusBill.CLOSED, closed_at__range=(start, end)
-    ).count()
+    opened_today = Q(created_at__range=(start, end))
+    closed_today = Q(status=StatusBill.CLOSED, closed_at__range=(start, end))
+
+    # 1) Rachunki otwarte/zamknięte tego dnia + 6) przychód z zapisanych sum
+    #    rachunków (Bill.total_with_discount) - jedno zapytanie
+    bill_totals = Bill.objects.filter(opened_today | closed_today).aggregate(
+        opened=Count("id", filter=opened_today),
+        closed=Count("id", filter=closed_today),
+        revenue=Sum("total_with_discount", filter=opened_today),
+        revenue_cash=Sum(
+            "total_with_discount",
+            filter=opened_today & Q(payment_method=PaymentMethod.CASH),
+        ),
+        revenue_card=Sum(
+            "total_with_discount",
+            filter=opened_today & Q(payment_method=PaymentMethod.CARD),
+        ),
+    )
+    # SQLite sumuje jako REAL, więc wracamy do groszy
+    revenue, revenue_cash, revenue_card = (
+        (bill_totals[key] or Decimal("0.00")).quantize(Decimal("0.01"))
+        for key in ("revenue", "revenue_cash", "revenue_card")
+    )
 
     # 2) Zakres itemów przypisujemy do dnia OTWARCIA rachunku.
     #    Jeśli wolisz dzień ZAMKNIĘCIA, użyj order__bill__closed_at__range=(start, end).
-    items_qs = OrderItem.objects.filter(
-        order__bill__created_at__range=(start, end)
-    ).select_related(
-        "order"
-    )  # mniej zapytań
-
-    # 3) Łączna sprzedaż (sumujemy quantity)
-    items_sold = items_qs.aggregate(total=Coalesce(Sum("quantity"), 0))["total"]
+    items_qs = OrderItem.objects.filter(order__bill__created_at__range=(start, end))
 
-    # 4) Kuchnia vs. Bar (po polu category na Order)
+    # 3) + 4) Kuchnia vs. Bar (po polu category na Order), suma to łączna sprzedaż
     by_category = (
-        items_qs.values("order__category")
-        .annotate(sold=Coalesce(Sum("quantity"), 0))
-        .order_by()
+        items_qs.values("order__category").annotate(sold=Sum("quantity")).order_by()
     )
     # Zamieniamy na prosty słownik typu {'kitchen': x, 'bar': y, ...}
     items_by_category = {row["order__category"]: row["sold"] for row in by_category}
 
-    # 5) Średni czas przygotowania (tylko tam, gdzie mamy oba timestampy)
-    # prep_delta = ExpressionWrapper(
-    #     F("finished_at") - F("created_at"),
-    #     output_field=DurationField(),
-    # )
-    # avg_prep = items_qs.filter(
-    #     started_at__isnull=False, finished_at__isnull=False
-    # ).aggregate(avg=Avg(prep_delta))["avg"]
-    orders_qs = (
+    # 5) Czas przygotowania zamówień kuchni bez pozycji z menu OTHER
+    #    (NOT EXISTS zamiast złączenia z pozycjami, które mnoży wiersze)
+    has_other_items = OrderItem.objects.filter(
+        order=OuterRef("pk"), menu_item__menu=MenuType.OTHER
+    )
+    prep_delta = ExpressionWrapper(
+        F("readied_at") - F("created_at"),
+        output_field=DurationField(),
+    )
+    prep = (
         Order.objects.filter(
             category=Location.KITCHEN,
             created_at__range=(start, end),
             preparing_at__isnull=False,
             readied_at__isnull=False,
         )
-    ).exclude(order_items__menu_item__menu=MenuType.OTHER)
-
-    prep_delta = ExpressionWrapper(
-        F("readied_at") - F("created_at"),
-        output_field=DurationField(),
+        .filter(~Exists(has_other_items))
+        .aggregate(total=Sum(prep_delta), count=Count("id"))
     )
 
-    avg_prep = orders_qs.aggregate(
-        avg=Avg(prep_delta),
-        count=Count("id"),
-    )["avg"]
-    # 6) revenue
-    revenue = Decimal("0.00")
-    revenue_cash = Decimal("0.00")
-    revenue_card = Decimal("0.00")
-
-    daily_bills = Bill.objects.filter(created_at__range=(start, end)).prefetch_related(
-        "orders__order_items__order_item_additions"
-    )
-    for bill in daily_bills:
-        summary = bill.bill_summary_view()
-        total = summary["total"]
-        discount = summary["cost_discount"]
-        print(total, discount, bill.payment_method)
-        revenue += total - discount
-        if bill.payment_method == PaymentMethod.CASH:
-            revenue_cash += total - discount
-        elif bill.payment_method == PaymentMethod.CARD:
-            revenue_card += total - discount
+    # 7) Ilości wg id_checkout - dania i dodatki (dodatek liczony razy ilość dania)
+    checkout_quantities = {
+        str(line["id_checkout"]): line["quantity"]
+        for line in sold_lines(
+            ("id_checkout",), order__bill__created_at__range=(start, end)
+        )
+    }
+
+    return {
+        "bills_opened": bill_totals["opened"],
+        "bills_closed": bill_totals["closed"],
+        "revenue": revenue,
+        "revenue_cash": revenue_cash,
+        "revenue_card": revenue_card,
+        "items_sold": sum(items_by_category.values()),
+        "items_by_category": items_by_category,
+        "prep_time_total": prep["total"] or timedelta(0),
+        "prep_count": prep["count"],
+        "checkout_quantities": checkout_quantities,
+    }
 
+
+def report_from_facts(date, facts: dict) -> dict:
+    """Słownik raportu (format `order/raport.html`) z faktów dnia lub okresu."""
     return {
         "date": date.isoformat(),
         "bills": {
-            "opened": bills_opened,
-            "closed": bills_closed,
+            "opened": facts["bills_opened"],
+            "closed": facts["bills_closed"],
         },
         "items": {
-            "total_sold": items_sold,
-            "by_category": items_by_category,
+            "total_sold": facts["items_sold"],
+            "by_category": facts["items_by_category"],
+            "by_checkout": facts["checkout_quantities"],
         },
         "kitchen_metrics": {
-            "avg_prep_time": avg_prep,  # timedelta lub None
+            # timedelta lub None
+            "avg_prep_time": (
+                facts["prep_time_total"] / facts["prep_count"]
+                if facts["prep_count"]
+                else None
+            ),
         },
-        "revenue": revenue,
-        "revenue_cash": revenue_cash,
-        "revenue_card": revenue_card,
+        "revenue": facts["revenue"],
+        "revenue_cash": facts["revenue_cash"],
+        "revenue_card": facts["revenue_card"],
     }
+
+
+def daily_summary(date=None):
+    """
+    Główny raport dzienny liczony na żywo z bazy. Zwraca słownik z KPI.
+    Domyślnie: dzisiaj (wg Europe/Warsaw).
+    Raporty z zapisanych faktów dziennych - zob. `order.rollup`.
+    """
+    if date is None:
+        date = timezone.localdate()
+    return report_from_facts(date, day_facts(date))
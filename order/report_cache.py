@@ -0,0 +1,112 @@
+import threading
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from order.models import Bill, DailyFacts, Order, StatusBill
+from order.raport import day_bounds_local
+from order.reporting import primary_reads, reads_consistent_at
+from order.rollup import bill_days, report_for_day
+from order.snapshots import OPEN_ORDER_STATUSES
+
+REPORT_CACHE_KEY = "daily_report:v1:{:%Y-%m-%d}"
+REPORT_CACHE_TIMEOUT = 30 * 24 * 3600
+
+
+class ReportCacheStats:
+    """Liczniki cache raportów dziennych (w obrębie procesu)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+report_cache_stats = ReportCacheStats()
+
+
+@primary_reads()
+def is_day_closed(day: date, read_at: float | None = None) -> bool:
+    """
+    Dzień minął, wszystkie jego rachunki są zamknięte, a zamówienia wydane
+    (czas przygotowania wchodzi do raportu) - raport już się nie zmieni.
+    Sprawdzane na `default`: kopia może jeszcze mieć otwarte rachunki.
+    Z `read_at` (chwila danych raportu, zob. `reads_consistent_at`) dzień
+    musi też nie zmienić się później - fakty dnia zapisane po tej chwili
+    znaczą, że raport z kopii jest starszy niż stan dnia.
+    """
+    if day >= timezone.localdate():
+        return False
+    bounds = day_bounds_local(day)
+    if Bill.objects.filter(created_at__range=bounds, status=StatusBill.OPEN).exists():
+        return False
+    # zamówienie bywa wydane już po zamknięciu rachunku
+    if Order.objects.filter(
+        created_at__range=bounds, status__in=OPEN_ORDER_STATUSES
+    ).exists():
+        return False
+    if read_at is None:
+        return True
+    changed_after_read = DailyFacts.objects.filter(
+        date=day, updated_at__gt=datetime.fromtimestamp(read_at, dt_timezone.utc)
+    )
+    return not changed_after_read.exists()
+
+
+def cached_report_for_day(day: date) -> dict:
+    """
+    Raport dzienny z cache. Raport dnia zamkniętego (`is_day_closed`) jest
+    zapisywany i kolejne odczyty nie dotykają bazy; pozostałe dni (dzisiejszy,
+    z otwartymi rachunkami) są liczone za każdym razem. Raport z kopii
+    raportowej trafia do cache tylko, gdy kopia obejmuje ostatnią zmianę dnia.
+    """
+    key = REPORT_CACHE_KEY.format(day)
+    report = cache.get(key)
+    if report is not None:
+        report_cache_stats.count("hits")
+        return report
+
+    report_cache_stats.count("misses")
+    read_at = reads_consistent_at()
+    report = report_for_day(day)
+    if is_day_closed(day, read_at):
+        cache.set(key, report, REPORT_CACHE_TIMEOUT)
+    return report
+
+
+def invalidate_days(days):
+    keys = [REPORT_CACHE_KEY.format(day) for day in days]
+    cache.delete_many(keys)
+    report_cache_stats.count("invalidations", len(keys))
+
+
+def invalidate_days_on_commit(days):
+    """
+    Po commicie usuwa z cache raporty podanych dni. Wołać po `refresh_days`
+    (i pochodnych), żeby cache nie wypełnił się starymi faktami.
+    """
+    days = sorted(days)
+    transaction.on_commit(lambda: invalidate_days(days))
+
+
+def invalidate_bill_days(bill: Bill):
+    """Po commicie usuwa z cache raporty dni rachunku (otwarcia i zamknięcia)."""
+    invalidate_days_on_commit(bill_days(bill))
@@ -0,0 +1,262 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from django.conf import settings
+from django.db import connections
+from django.http import StreamingHttpResponse
+
+REPORTING_DB = "reporting"
+
+# ustawiane przez widoki raportów i historii; router kieruje wtedy odczyty
+# na kopię bazy, żeby długie zapytania nie blokowały zapisów zamówień
+_use_reporting: ContextVar[bool] = ContextVar("use_reporting", default=False)
+_refresh_lock = threading.Lock()
+
+# klucz sesji: chwila ostatniego zapisu użytkownika widocznego w historii
+# (np. usunięcie rachunku) - do tej chwili czyta on z `default`
+PRIMARY_WRITE_SESSION_KEY = "reporting_primary_write_at"
+
+
+def _is_mirror() -> bool:
+    """W testach alias raportowy wskazuje na tę samą bazę (TEST MIRROR)."""
+    default = connections["default"].settings_dict
+    reporting = connections[REPORTING_DB].settings_dict
+    return reporting is default or reporting["NAME"] == default["NAME"]
+
+
+def reporting_enabled() -> bool:
+    return REPORTING_DB in settings.DATABASES and not _is_mirror()
+
+
+def _stamp_path() -> str:
+    return f"{settings.DATABASES[REPORTING_DB]['NAME']}.taken_at"
+
+
+def snapshot_taken_at() -> float | None:
+    """
+    Chwila (time.time()), z której pochodzą dane kopii; None, gdy kopii
+    jeszcze nie ma. Zapisana jako mtime pliku obok kopii - mtime samej kopii
+    zmienia checkpoint WAL po backupie.
+    """
+    try:
+        if not os.stat(settings.DATABASES[REPORTING_DB]["NAME"]).st_size:
+            return None
+        return os.stat(_stamp_path()).st_mtime
+    except OSError:
+        return None
+
+
+def snapshot_age() -> float | None:
+    """Wiek danych kopii w sekundach; None, gdy kopii jeszcze nie ma."""
+    taken_at = snapshot_taken_at()
+    return time.time() - taken_at if taken_at is not None else None
+
+
+def refresh_snapshot():
+    """
+    Kopiuje bazę `default` do pliku aliasu raportowego przez online backup
+    API SQLite. Kopia jest spójna (jedna transakcja odczytu na źródle),
+    a czytający ją dostają starą albo nową wersję w całości.
+    """
+    path = settings.DATABASES[REPORTING_DB]["NAME"]
+    source = connections["default"]
+    source.ensure_connection()
+    # kopia nadpisywana w miejscu: otwarte połączenia aliasu raportowego
+    # zobaczą nową wersję w kolejnej transakcji
+    target = sqlite3.connect(path, timeout=20)
+    try:
+        taken_at, started = time.time(), time.monotonic()
+        source.connection.backup(target)
+        print(f"Reporting snapshot refreshed in {time.monotonic() - started:.3f}s")
+    finally:
+        target.close()
+    # dane kopii są co najmniej tak świeże jak początek backupu
+    with open(_stamp_path(), "w"):
+        pass
+    os.utime(_stamp_path(), (taken_at, taken_at))
+
+
+def refresh_reporting():
+    """
+    Zapisuje brakujące fakty minionych dni (zob. `settle_past_days`)
+    i odświeża kopię, żeby je zawierała. Poza żądaniem: w wątku tła
+    (`request_snapshot_refresh`) albo z polecenia.
+    """
+    # import w funkcji - order.rollup importuje ten moduł
+    from order.rollup import settle_past_days
+
+    settle_past_days()
+    refresh_snapshot()
+
+
+def _refresh_in_background():
+    try:
+        refresh_reporting()
+    except Exception as e:
+        print(f"Reporting snapshot refresh failed: {e!r}")
+    finally:
+        connections.close_all()
+        _refresh_lock.release()
+
+
+def request_snapshot_refresh() -> bool:
+    """
+    Uruchamia `refresh_reporting` w wątku tła, jeśli jeszcze nie trwa.
+    Żądanie nie czeka na backup - czyta dotychczasową kopię.
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        return False
+    threading.Thread(
+        target=_refresh_in_background, name="reporting-refresh", daemon=True
+    ).start()
+    return True
+
+
+def ensure_fresh_snapshot() -> bool:
+    """
+    Zleca odświeżenie kopii starszej niż REPORTING_SNAPSHOT_MAX_AGE i mówi,
+    czy bieżące żądanie może z niej czytać. Nie może, gdy kopii nie ma
+    albo jest starsza niż dwa takie okresy (np. pierwszy raport po nocy) -
+    wtedy jedno żądanie czyta z `default`, a kopia odświeża się w tle.
+    """
+    if not reporting_enabled():
+        return False
+    age = snapshot_age()
+    if age is None or age >= settings.REPORTING_SNAPSHOT_MAX_AGE:
+        request_snapshot_refresh()
+    return age is not None and age < 2 * settings.REPORTING_SNAPSHOT_MAX_AGE
+
+
+def reads_consistent_at() -> float:
+    """
+    Chwila, z której pochodzą odczyty bieżącego kontekstu: początek kopii
+    w widoku raportowym, w przeciwnym razie teraz.
+    """
+    if _use_reporting.get() and reporting_enabled():
+        return snapshot_taken_at() or 0.0
+    return time.time()
+
+
+def note_primary_write(request):
+    """
+    Po zapisie widocznym w historii (usunięcie rachunku, rabat) ten
+    użytkownik czyta z `default`, dopóki kopia nie obejmie zapisu.
+    """
+    session = getattr(request, "session", None)
+    if session is not None:
+        session[PRIMARY_WRITE_SESSION_KEY] = time.time()
+
+
+def _reads_own_writes(request) -> bool:
+    session = getattr(request, "session", None)
+    written_at = session.get(PRIMARY_WRITE_SESSION_KEY) if session else None
+    return written_at is not None and written_at >= (snapshot_taken_at() or 0.0)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Odczyty w bloku idą do `default` także w widoku raportowym. Dla kodu
+    zapisującego wynik (fakty dnia) i sprawdzeń stanu bieżącego
+    (czy dzień jest jeszcze otwarty).
+    """
+    token = _use_reporting.set(False)
+    try:
+        yield
+    finally:
+        _use_reporting.reset(token)
+
+
+class ReportingRouter:
+    """
+    Odczyty w widokach oznaczonych `reporting_view` idą do kopii bazy
+    (alias `reporting`), wszystko inne - w tym każdy zapis - do `default`.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_reporting.get() and reporting_enabled():
+            return REPORTING_DB
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # kopia ma te same tabele i klucze co `default`
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # schemat kopii pochodzi z backupu
+        return db != REPORTING_DB
+
+
+def _iterate_on_reporting(iterable: Iterable) -> Iterator:
+    """Każdy krok generatora (np. eksportu) czyta z kopii bazy."""
+    iterator = iter(iterable)
+    while True:
+        token = _use_reporting.set(True)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _use_reporting.reset(token)
+        yield item
+
+
+async def _aiterate_on_reporting(iterable: AsyncIterable) -> AsyncIterator:
+    """
+    Jak `_iterate_on_reporting` dla treści asynchronicznej (ASGI); flaga
+    trafia do wątku przez kontekst kopiowany przez sync_to_async.
+    """
+    iterator = aiter(iterable)
+    while True:
+        token = _use_reporting.set(True)
+        try:
+            item = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            _use_reporting.reset(token)
+        yield item
+
+
+def reporting_view(view_func):
+    """
+    Widok raportowy: odczyty z kopii bazy odświeżanej w tle co
+    REPORTING_SNAPSHOT_MAX_AGE sekund. Treść strumieniowana też czyta z kopii.
+    Bez kopii (albo po własnym zapisie nowszym od kopii) - z `default`.
+    """
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        use_snapshot = ensure_fresh_snapshot() and not _reads_own_writes(request)
+        token = _use_reporting.set(use_snapshot)
+        try:
+            response = view_func(request, *args, **kwargs)
+            # TemplateResponse (widoki klasowe) renderuje się leniwie
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        finally:
+            _use_reporting.reset(token)
+        if use_snapshot and isinstance(response, StreamingHttpResponse):
+            iterate = (
+                _aiterate_on_reporting if response.is_async else _iterate_on_reporting
+            )
+            response.streaming_content = iterate(response.streaming_content)
+        return response
+
+    return wrapper
+
+
+class ReportingViewMixin:
+    """`reporting_view` dla widoków klasowych (historia, lista rachunków)."""
+
+    def dispatch(self, request, *args, **kwargs):
+        return reporting_view(super().dispatch)(request, *args, **kwargs)
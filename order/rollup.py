@@ -0,0 +1,148 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from order.models import Bill, DailyFacts, Order
+from order.prep_stats import invalidate_prep_days, store_prep_days
+from order.raport import day_facts, report_from_facts
+from order.reporting import primary_reads
+
+# pola rachunku, których zmiana zmienia fakty dnia
+BILL_FACT_FIELDS = {"status", "closed_at", "discount", "payment_method"}
+
+
+@primary_reads()
+def refresh_day(day: date) -> DailyFacts:
+    """
+    Przelicza fakty jednego dnia z bazy i zapisuje je (koszt jednego dnia).
+    Tylko po stronie zapisów (sygnały, polecenia) i zawsze z `default`.
+    """
+    facts, _ = DailyFacts.objects.update_or_create(date=day, defaults=day_facts(day))
+    return facts
+
+
+def bill_days(bill: Bill) -> set[date]:
+    """Dni, do których liczą się dane rachunku: otwarcia i zamknięcia."""
+    days = {timezone.localdate(bill.created_at)}
+    if bill.closed_at:
+        days.add(timezone.localdate(bill.closed_at))
+    return days
+
+
+def refresh_days(days) -> list[date]:
+    """
+    Po commicie przelicza fakty podanych minionych dni i usuwa zapisane
+    czasy przygotowania dni od pierwszego z nich do ostatniego (najwyżej
+    wczoraj). Dzisiejszych faktów nie zapisujemy - raporty liczą je przy
+    odczycie (`facts_for_range`), więc wydanie zamówienia czy zamknięcie
+    rachunku nie przelicza całego dnia. Zwraca wszystkie dni (posortowane).
+    """
+    days = sorted(days)
+    yesterday = timezone.localdate() - timedelta(days=1)
+    past = [day for day in days if day <= yesterday]
+
+    def refresh():
+        for day in past:
+            refresh_day(day)
+        invalidate_prep_days(past[0], min(days[-1], yesterday))
+
+    if past:
+        transaction.on_commit(refresh)
+    return days
+
+
+def refresh_bill_days(bill: Bill) -> list[date]:
+    """Przelicza dni rachunku (zamknięcie, usunięcie, rabat), zob. `refresh_days`."""
+    return refresh_days(bill_days(bill))
+
+
+def refresh_readied_days(order_ids: list[int]) -> list[date]:
+    """
+    Po wydaniu zamówień przelicza dni ich złożenia (czas przygotowania
+    w faktach) do dziś (pozycje kończone w dniu wydania, zob. `refresh_days`). Zamówienie bywa
+    wydane po zamknięciu rachunku, a wtedy sygnały rachunku nic nie
+    odświeżają. Jedno zapytanie.
+    """
+    created = Order.objects.filter(id__in=order_ids).values_list(
+        "created_at", flat=True
+    )
+    days = {timezone.localdate(moment) for moment in created}
+    if not days:
+        return []
+    return refresh_days(days | {timezone.localdate()})
+
+
+def _merge(total: dict, facts: dict):
+    for key, value in facts.items():
+        if isinstance(value, dict):
+            merged = total.setdefault(key, {})
+            for name, count in value.items():
+                merged[name] = merged.get(name, 0) + count
+        else:
+            total[key] = total[key] + value
+
+
+def settle_past_days() -> int:
+    """
+    Zapisuje fakty (`DailyFacts`) i czasy przygotowania (`DailyPrepTimes`)
+    minionych dni, których jeszcze nie ma: dni bez ruchu, historia sprzed
+    rollupu, dni unieważnione zmianą. Poza żądaniem - przed odświeżeniem
+    kopii raportowej. Zwraca liczbę dni z zapisanymi faktami.
+    """
+    first = Bill.objects.aggregate(first=Min("created_at"))["first"]
+    if first is None:
+        return 0
+    day, yesterday = timezone.localdate(first), timezone.localdate() - timedelta(days=1)
+    stored = set(
+        DailyFacts.objects.filter(date__range=(day, yesterday)).values_list(
+            "date", flat=True
+        )
+    )
+    settled = 0
+    while day <= yesterday:
+        if day not in stored:
+            refresh_day(day)
+            settled += 1
+        day += timedelta(days=1)
+    store_prep_days(timezone.localdate(first), yesterday)
+    return settled
+
+
+def facts_for_range(start: date, end: date) -> dict:
+    """
+    Fakty okresu [start, end] zsumowane z zapisanych wierszy `DailyFacts`,
+    koszt O(liczba dni). Brakujące dni i dzień dzisiejszy (jeszcze się
+    zmienia) są liczone w pamięci - odczyt raportu niczego nie zapisuje.
+    """
+    today = timezone.localdate()
+    rows = {f.date: f for f in DailyFacts.objects.filter(date__range=(start, end))}
+
+    total = {
+        "bills_opened": 0,
+        "bills_closed": 0,
+        "revenue": Decimal("0.00"),
+        "revenue_cash": Decimal("0.00"),
+        "revenue_card": Decimal("0.00"),
+        "items_sold": 0,
+        "items_by_category": {},
+        "prep_time_total": timedelta(0),
+        "prep_count": 0,
+        "checkout_quantities": {},
+    }
+    day = start
+    while day <= min(end, today):
+        facts = rows.get(day)
+        if facts is None or day == today:
+            _merge(total, day_facts(day))
+        else:
+            _merge(total, {key: getattr(facts, key) for key in total})
+        day += timedelta(days=1)
+    return total
+
+
+def report_for_day(day: date) -> dict:
+    """Raport dzienny (format `daily_summary`) z zapisanych faktów."""
+    return report_from_facts(day, facts_for_range(day, day))
@@ -1,12 +1,14 @@
 # order/signals.py
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.db import transaction
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from django.utils import timezone
 
-from order.models import Notification, NotificationStatus, Order, StatusOrder
+from order.board import get_board, publish_status_update
+from order.models import Bill, Order, StatusBill, StatusOrder
+from order.notifications import notify_orders_ready
+from order.report_cache import invalidate_days_on_commit
+from order.rollup import BILL_FACT_FIELDS, refresh_bill_days, refresh_readied_days
+from order.throughput import record_orders_readied
 
 
 @receiver(pre_save, sender=Order)
@@ -40,37 +42,42 @@ def order_post_save(sender, instance: Order, created, **kwargs):
         return
 
     prev = getattr(instance, "_prev_status", None)
+    if prev != instance.status:
+        # tablica stacji w pamięci + powiadomienie ekranów kuchni/baru
+        transaction.on_commit(
+            lambda: publish_status_update(
+                instance.category, instance.pk, instance.status
+            )
+        )
+
     if prev != StatusOrder.READY and instance.status == StatusOrder.READY:
+        record_orders_readied([instance.pk])
+        invalidate_days_on_commit(refresh_readied_days([instance.pk]))
         # Wykonaj po commicie, żeby stan w DB był już stabilny
-        def _after_commit():
-            qs = Notification.objects.select_related(
-                "worker", "order_item", "order_item__order", "order_item__order__bill"
-            ).filter(
-                order_item__order=instance,
-                status=NotificationStatus.PREPARE,
-            )
+        transaction.on_commit(lambda: notify_orders_ready([instance.pk]))
+
+
+@receiver(post_delete, sender=Order)
+def order_post_delete(sender, instance: Order, **kwargs):
+    order_id = instance.pk
+    transaction.on_commit(lambda: get_board(instance.category).discard_order(order_id))
+
+
+@receiver(pre_delete, sender=Bill)
+def bill_pre_delete(sender, instance: Bill, **kwargs):
+    # przed usunięciem, póki istnieją powiązania rachunek-stolik
+    if instance.status == StatusBill.OPEN:
+        instance.release_tables()
+
+
+@receiver(post_save, sender=Bill)
+def bill_post_save(sender, instance: Bill, created, update_fields=None, **kwargs):
+    # dopisywanie zamówień (add_to_subtotal) nie zmienia faktów zamkniętych dni
+    if created or (update_fields is not None and not BILL_FACT_FIELDS & update_fields):
+        return
+    refresh_bill_days(instance)
+
 
-            now = timezone.now()
-            payloads = [
-                {
-                    "id": n.id,
-                    "worker": str(n.worker),
-                    "order_item": n.order_item.full_name_snapshot
-                    + (f" ({n.order_item.note})" if n.order_item.note else ""),
-                    "table": n.order_item.order.bill.str_tables(),
-                    "last_update": now.isoformat(),
-                    "status": NotificationStatus.WAIT,
-                }
-                for n in qs
-            ]
-
-            qs.update(status=NotificationStatus.WAIT, last_update=now)
-
-            if payloads:
-                cl = get_channel_layer()
-                for p in payloads:
-                    async_to_sync(cl.group_send)(
-                        "notifications", {"type": "new_notification", **p}
-                    )
-
-        transaction.on_commit(_after_commit)
+@receiver(post_delete, sender=Bill)
+def bill_post_delete(sender, instance: Bill, **kwargs):
+    refresh_bill_days(instance)
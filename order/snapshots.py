@@ -0,0 +1,76 @@
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from menu.models import Location
+from order.models import NotificationStatus, Order, OrderItem, StatusOrder
+
+OPEN_ORDER_STATUSES = (StatusOrder.ORDER, StatusOrder.PREPARING)
+CREATED_AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+# kolejność pozycji na ekranach stacji: nazwa bazowa, potem id (ta sama
+# w snapshocie z bazy i w wiadomości `new_order`, zob. order_item_sort_key)
+ORDER_ITEM_ORDERING = ("name_snapshot", "id")
+
+
+def order_item_sort_key(item: OrderItem):
+    return item.name_snapshot, item.id
+
+
+def open_orders_queryset(location: Location):
+    """
+    Otwarte zamówienia (ORDER/PREPARING) danej stacji razem ze wszystkim,
+    czego potrzebuje ekran kuchni/baru. Stała liczba zapytań niezależnie
+    od liczby zamówień:
+    1) zamówienia + rachunek + kelner + użytkownik,
+    2) stoliki rachunków,
+    3) pozycje (z zapisaną nazwą `display_name`) + notyfikacje.
+    """
+    items = OrderItem.objects.select_related("notification").order_by(
+        *ORDER_ITEM_ORDERING
+    )
+    return (
+        Order.objects.filter(status__in=OPEN_ORDER_STATUSES, category=location)
+        .select_related("bill__service__user")
+        .prefetch_related(
+            "bill__table",
+            Prefetch("order_items", queryset=items),
+        )
+        .order_by("created_at")
+    )
+
+
+def serialize_order_item(item: OrderItem) -> dict:
+    notification_status = None
+    try:
+        notification_status = item.notification.status
+    except OrderItem.notification.RelatedObjectDoesNotExist:
+        pass
+
+    return {
+        "id": item.id,
+        "name_snapshot": item.full_name_snapshot,
+        "quantity": item.quantity,
+        "note": item.note,
+        "is_done": notification_status
+        in [NotificationStatus.WAIT, NotificationStatus.SERVE],
+    }
+
+
+def serialize_order(order: Order) -> dict:
+    """Payload zamówienia w formacie oczekiwanym przez ekrany stacji."""
+    service = order.bill.service
+    return {
+        "id": order.id,
+        "sender": service.user.username if service else "",
+        "table": order.bill.str_tables(),
+        "status": order.status,
+        "order_items": [serialize_order_item(i) for i in order.order_items.all()],
+        "created_at": timezone.localtime(order.created_at).strftime(CREATED_AT_FORMAT),
+    }
+
+
+def build_orders_snapshot(location: Location) -> list[dict]:
+    """
+    Buduje listę otwartych zamówień stacji w pamięci, bez zapytań
+    per zamówienie/pozycja (zob. `open_orders_queryset`).
+    """
+    return [serialize_order(order) for order in open_orders_queryset(location)]
@@ -0,0 +1,128 @@
+from decimal import Decimal
+from typing import Iterable
+
+from django.db.models import DecimalField, F, Min, Sum
+
+from order.models import Bill, OrderItem, OrderItemAddition
+
+LINE_TOTAL_FIELD = DecimalField(max_digits=12, decimal_places=2)
+CENT = Decimal("0.01")
+
+
+# klucze grupowania `sold_lines`: (ścieżka od OrderItem, od OrderItemAddition)
+SOLD_GROUPS = {
+    "bill_id": ("order__bill_id", "order_item__order__bill_id"),
+    "name": ("name_snapshot", "name_snapshot"),
+    "id_checkout": ("menu_item__id_checkout", "addition__id_checkout"),
+}
+
+
+def _sold_rows(queryset, paths: dict, quantity: str, group_by, **first):
+    """Jedno zapytanie grupujące `sold_lines` (dania albo dodatki)."""
+    return (
+        queryset.values(**{key: F(paths[key]) for key in group_by})
+        .annotate(
+            **{
+                key: Min(paths[key])
+                for key in ("id_checkout", "name")
+                if key not in group_by
+            },
+            **first,
+            sold=Sum(quantity),
+            total_cost=Sum(
+                F("price_snapshot") * F(quantity), output_field=LINE_TOTAL_FIELD
+            ),
+        )
+        .order_by()
+    )
+
+
+def sold_lines(group_by: tuple[str, ...], **item_filter) -> list[dict]:
+    """
+    Sprzedaż dań i dodatków (dodatek liczony razy ilość dania) pogrupowana
+    po `group_by` (klucze SOLD_GROUPS) w dwóch zapytaniach grupujących;
+    danie i dodatek o tym samym kluczu łączą się w jeden wiersz.
+    `item_filter` to filtr OrderItem (dodatki przez `order_item__`).
+
+    Wiersze w kolejności pierwszego wystąpienia (danie, potem jego dodatki),
+    każdy z polami `group_by` oraz "id_checkout", "name", "quantity"
+    i "total_cost" (w groszach).
+    """
+    dishes = _sold_rows(
+        OrderItem.objects.filter(**item_filter),
+        {key: paths[0] for key, paths in SOLD_GROUPS.items()},
+        "quantity",
+        group_by,
+        first_item=Min("id"),
+    )
+    additions = _sold_rows(
+        OrderItemAddition.objects.filter(
+            **{f"order_item__{key}": value for key, value in item_filter.items()}
+        ),
+        {key: paths[1] for key, paths in SOLD_GROUPS.items()},
+        "order_item__quantity",
+        group_by,
+        first_item=Min("order_item_id"),
+        first_addition=Min("id"),
+    )
+    # danie przed swoimi dodatkami
+    rows = [((row["first_item"], 0, 0), row) for row in dishes]
+    rows += [((row["first_item"], 1, row["first_addition"]), row) for row in additions]
+
+    lines = {}
+    for _, row in sorted(rows, key=lambda r: r[0]):
+        key = tuple(row[field] for field in group_by)
+        line = lines.setdefault(
+            key,
+            {
+                **{field: row[field] for field in group_by},
+                "id_checkout": row["id_checkout"],
+                "name": row["name"],
+                "quantity": 0,
+                "total_cost": Decimal("0.00"),
+            },
+        )
+        line["quantity"] += row["sold"]
+        # SQLite liczy sumy jako REAL, więc wracamy do groszy
+        line["total_cost"] += row["total_cost"].quantize(CENT)
+    return list(lines.values())
+
+
+def bill_summaries(bills: Iterable[Bill]) -> dict[int, dict]:
+    """
+    Podsumowania wielu rachunków w dwóch zapytaniach grupujących
+    (dania i dodatki), niezależnie od liczby rachunków i pozycji.
+
+    Dla każdego rachunku zwraca `{"total", "summary", "cost_discount"}`,
+    gdzie `summary` to `{nazwa: {"id", "quantity", "total_cost"}}` w kolejności
+    pierwszego wystąpienia na rachunku (danie, potem jego dodatki).
+    """
+    bills = list(bills)
+    bill_ids = [bill.pk for bill in bills]
+
+    lines = {pk: [] for pk in bill_ids}
+    for line in sold_lines(("bill_id", "name"), order__bill_id__in=bill_ids):
+        lines[line["bill_id"]].append(line)
+
+    summaries = {}
+    for bill in bills:
+        summary = {
+            line["name"]: {
+                "id": line["id_checkout"],
+                "quantity": line["quantity"],
+                "total_cost": line["total_cost"],
+            }
+            for line in lines[bill.pk]
+        }
+        total = sum((line["total_cost"] for line in lines[bill.pk]), Decimal("0.00"))
+        cost_discount = Bill.discount_amount(total, bill.discount)
+        summaries[bill.pk] = {
+            "total": total,
+            "summary": summary,
+            "cost_discount": cost_discount,
+        }
+    return summaries
+
+
+def bill_summary(bill: Bill) -> dict:
+    return bill_summaries([bill])[bill.pk]
@@ -1,7 +1,19 @@
+from datetime import timedelta
+
 from django import template
 
 register = template.Library()
 
+WEEKDAYS = [
+    "Poniedziałek",
+    "Wtorek",
+    "Środa",
+    "Czwartek",
+    "Piątek",
+    "Sobota",
+    "Niedziela",
+]
+
 
 @register.filter
 def duration_hhmmss(value):
@@ -15,3 +27,17 @@ def duration_hhmmss(value):
     hours, rem = divmod(total_seconds, 3600)
     minutes, seconds = divmod(rem, 60)
     return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+@register.filter
+def seconds_hhmmss(value):
+    """Jak `duration_hhmmss`, ale dla liczby sekund."""
+    if value is None:
+        return "—"
+    return duration_hhmmss(timedelta(seconds=value))
+
+
+@register.filter
+def weekday_name(value):
+    """0 -> "Poniedziałek" ... 6 -> "Niedziela"."""
+    return WEEKDAYS[value]
@@ -1,3 +1,262 @@
-# from django.test import TestCase
+import os
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.http import QueryDict
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from menu.models import Item, Location, MenuType
+from order.board import LiveBoard
+from order.export import checkout_rows
+from order.management.commands.check_query_plans import full_scans
+from order.models import (
+    Bill,
+    DailyFacts,
+    Order,
+    OrderItem,
+    OrderItemAddition,
+    PaymentMethod,
+    StatusBill,
+    StatusOrder,
+)
+from order.pagination import encode_cursor, keyset_page
+from order.raport import day_facts
+from order.report_cache import is_day_closed
+from order.rollup import facts_for_range, refresh_day, settle_past_days
+from order.snapshots import build_orders_snapshot
+from order.summary import bill_summary
+from order.views import BillListView
+from service.models import Table
+from worker.models import Worker
+
+
+class OrdersFixtureMixin:
+    """Rachunki z zamówieniem kuchni: dwie pozycje z dodatkiem, dwa stoliki."""
+
+    def setUp(self):
+        self.worker = Worker.objects.create(user=User.objects.create(username="anna"))
+        self.tables = [Table.objects.create(name=str(i), x=0, y=0) for i in range(2)]
+        self.dish = Item.objects.create(
+            name="Jajecznica", id_checkout=5, price=Decimal("20.50")
+        )
+        self.addition = Item.objects.create(
+            name="Boczek", id_checkout=17, price=Decimal("3.00"), menu=MenuType.OTHER
+        )
+
+    def make_bills(self, n: int):
+        for _ in range(n):
+            bill = Bill.objects.create(service=self.worker)
+            bill.table.add(*self.tables)
+            order = Order.objects.create(bill=bill, category=Location.KITCHEN)
+            for quantity in (1, 2):
+                order_item = OrderItem.objects.create(
+                    order=order,
+                    menu_item=self.dish,
+                    name_snapshot=self.dish.name,
+                    display_name=f"{self.dish.name} ({self.addition.name})",
+                    price_snapshot=self.dish.price,
+                    quantity=quantity,
+                )
+                OrderItemAddition.objects.create(
+                    order_item=order_item,
+                    addition=self.addition,
+                    name_snapshot=self.addition.name,
+                    price_snapshot=self.addition.price,
+                )
+
+
+class BillListViewQueriesTest(OrdersFixtureMixin, TestCase):
+    def test_query_count_does_not_grow_with_bills(self):
+        # rachunki, stoliki, zamówienia i dwa zapytania podsumowań; więcej
+        # rachunków niż `paginate_by` daje tylko następną stronę
+        for total in (1, 5, 30):
+            self.make_bills(total - Bill.objects.count())
+            request = RequestFactory().get("/")
+            with self.assertNumQueries(5):
+                html = BillListView.as_view()(request).render().content.decode()
+            self.assertIn("Jajecznica", html)
+            self.assertIn("70.50", html)
+
+
+class OrdersSnapshotQueriesTest(OrdersFixtureMixin, TestCase):
+    def test_query_count_does_not_grow_with_orders(self):
+        # zamówienia z rachunkiem i kelnerem, stoliki, pozycje z notyfikacjami
+        for total in (1, 5, 20):
+            self.make_bills(total - Order.objects.count())
+            with self.assertNumQueries(3):
+                snapshot = build_orders_snapshot(Location.KITCHEN)
+            self.assertEqual(len(snapshot), total)
+            self.assertEqual(len(snapshot[0]["order_items"]), 2)
+
+
+class QueryPlansTest(TestCase):
+    def test_hot_queries_use_indexes(self):
+        # CommandError przy pełnym przejściu którejkolwiek tabeli
+        call_command("check_query_plans", stdout=StringIO())
+
+    def test_full_scans(self):
+        self.assertEqual(
+            full_scans("SCAN order_bill", "order_bill"), ["SCAN order_bill"]
+        )
+        plan = "SEARCH order_bill USING INDEX bill_status_closed_at_idx (status=?)"
+        self.assertEqual(full_scans(plan, "order_bill"), [plan])
+        self.assertEqual(full_scans(plan, "order_bill", status_only=True), [])
+        self.assertEqual(
+            full_scans(
+                "SEARCH order_bill USING INDEX bill_status_closed_at_idx "
+                "(status=? AND closed_at>? AND closed_at<?)",
+                "order_bill",
+            ),
+            [],
+        )
+
+
+class DailyFactsReadTest(OrdersFixtureMixin, TestCase):
+    def test_range_report_does_not_write(self):
+        self.make_bills(2)
+        week_ago = timezone.localdate() - timedelta(days=7)
+        DailyFacts.objects.all().delete()
+        facts = facts_for_range(week_ago, timezone.localdate())
+        self.assertEqual(facts["bills_opened"], 2)
+        self.assertFalse(DailyFacts.objects.exists())
+
+    def test_settle_past_days(self):
+        self.make_bills(1)
+        Bill.objects.update(created_at=timezone.now() - timedelta(days=3))
+        DailyFacts.objects.all().delete()
+        self.assertEqual(settle_past_days(), 3)
+        self.assertEqual(settle_past_days(), 0)
+
+
+class ClosedDayCacheTest(OrdersFixtureMixin, TestCase):
+    def test_report_older_than_day_change_is_not_cached(self):
+        self.make_bills(1)
+        moment = timezone.now() - timedelta(days=2)
+        Bill.objects.update(
+            created_at=moment, closed_at=moment, status=StatusBill.CLOSED
+        )
+        day = timezone.localdate(moment)
+        read_at = time.time()
+        time.sleep(0.01)
+        refresh_day(day)
+        self.assertFalse(is_day_closed(day, read_at))
+        self.assertTrue(is_day_closed(day, time.time()))
+
+    def test_open_order_keeps_day_open(self):
+        self.make_bills(1)
+        moment = timezone.now() - timedelta(days=2)
+        Bill.objects.update(
+            created_at=moment, closed_at=moment, status=StatusBill.CLOSED
+        )
+        Order.objects.update(created_at=moment, status=StatusOrder.PREPARING)
+        day = timezone.localdate(moment)
+        self.assertFalse(is_day_closed(day))
+        Order.objects.update(status=StatusOrder.READY)
+        self.assertTrue(is_day_closed(day))
+
+    def test_order_readied_after_bill_closed_refreshes_day(self):
+        self.make_bills(1)
+        moment = timezone.now() - timedelta(days=2)
+        Bill.objects.update(
+            created_at=moment, closed_at=moment, status=StatusBill.CLOSED
+        )
+        Order.objects.update(created_at=moment, preparing_at=moment)
+        day = timezone.localdate(moment)
+        refresh_day(day)
+        order = Order.objects.get()
+        order.status = StatusOrder.READY
+        order.readied_at = moment + timedelta(minutes=12)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        facts = DailyFacts.objects.get(date=day)
+        self.assertEqual(facts.prep_count, 1)
+        self.assertEqual(facts.prep_time_total, timedelta(minutes=12))
+
+
+class CloseBillTest(OrdersFixtureMixin, TestCase):
+    def test_second_close_does_not_release_tables_again(self):
+        other = Bill.objects.create(service=self.worker)
+        other.occupy_tables([self.tables[0].pk])
+        bill = Bill.objects.create(service=self.worker)
+        bill.occupy_tables([table.pk for table in self.tables])
+        url = reverse("service:close-bill", args=[bill.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {"payment_method": PaymentMethod.CARD})
+            self.client.post(url, {"payment_method": PaymentMethod.CASH})
+        bill.refresh_from_db()
+        self.assertEqual(bill.payment_method, PaymentMethod.CARD)
+        self.assertEqual(
+            list(Table.objects.order_by("pk").values_list("open_bills", "is_occupied")),
+            [(1, True), (0, False)],
+        )
+        self.assertTrue(Bill.objects.get(pk=other.pk).close())
+        self.assertFalse(Bill.objects.get(pk=other.pk).close())
+
+
+@mock.patch.dict(os.environ, {"PIN": "1"})
+class DiagnosticViewsPinTest(TestCase):
+    def test_pin_required(self):
+        for name in ("board-check", "executor-stats", "report-cache-stats"):
+            url = reverse(name)
+            self.assertTemplateUsed(self.client.get(url), "order/pin_form.html")
+            self.assertEqual(self.client.post(url, {"pin": "0"}).status_code, 302)
+            response = self.client.post(url, {"pin": "1"})
+            self.assertEqual(response["Content-Type"], "application/json")
+
+    @mock.patch.object(LiveBoard, "check", return_value=["stale order"])
+    @mock.patch.object(LiveBoard, "is_loaded", new_callable=mock.PropertyMock)
+    @mock.patch.object(LiveBoard, "load")
+    def test_resync_needs_post(self, load, is_loaded, check):
+        is_loaded.return_value = True
+        url = reverse("board-check") + "?resync=1"
+        self.client.get(url)
+        load.assert_not_called()
+        self.client.post(url, {"pin": "1"})
+        load.assert_called()
+
+
+class SoldLinesTest(OrdersFixtureMixin, TestCase):
+    def test_export_facts_and_summary_agree(self):
+        self.make_bills(2)
+        today = timezone.localdate()
+        self.assertEqual(
+            list(checkout_rows(today, today)),
+            [
+                {
+                    "id_checkout": 5,
+                    "name": "Jajecznica",
+                    "quantity": 6,
+                    "total_cost": Decimal("123.00"),
+                },
+                {
+                    "id_checkout": 17,
+                    "name": "Boczek",
+                    "quantity": 6,
+                    "total_cost": Decimal("18.00"),
+                },
+            ],
+        )
+        self.assertEqual(day_facts(today)["checkout_quantities"], {"5": 6, "17": 6})
+        summary = bill_summary(Bill.objects.first())
+        self.assertEqual(list(summary["summary"]), ["Jajecznica", "Boczek"])
+        self.assertEqual(summary["total"], Decimal("70.50"))
+
+
+class KeysetPageTest(OrdersFixtureMixin, TestCase):
+    def test_before_newest_shows_first_page(self):
+        self.make_bills(3)
+        newest = Bill.objects.order_by("-created_at", "-id").first()
+        query = QueryDict(mutable=True)
+        query["before"] = encode_cursor(newest.created_at, newest.pk)
+        page = keyset_page(Bill.objects.all(), query, per_page=2)
+        self.assertEqual(page.object_list[0], newest)
+        self.assertEqual(len(page), 2)
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
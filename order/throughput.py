@@ -0,0 +1,148 @@
+from datetime import date, datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from menu.models import Location
+from order.models import HourlyThroughput, Order
+from order.raport import day_bounds_local
+
+COUNTS = ["orders_created", "orders_readied", "items_sold"]
+
+
+def hour_start(moment: datetime) -> datetime:
+    """Początek godziny (czasu lokalnego), do której należy `moment`."""
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def bump(category: Location, hour: datetime, **deltas):
+    """
+    Zwiększa liczniki godziny o `deltas` jednym UPDATE (F-wyrażenia), więc
+    równoległe zapisy się nie nadpisują. Pierwszy zapis godziny tworzy wiersz.
+    """
+    updates = {name: F(name) + value for name, value in deltas.items()}
+    rows = HourlyThroughput.objects.filter(hour=hour, category=category)
+    with transaction.atomic():
+        if rows.update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                HourlyThroughput.objects.create(hour=hour, category=category, **deltas)
+        except IntegrityError:
+            # ktoś utworzył wiersz w międzyczasie
+            rows.update(**updates)
+
+
+def record_order_created(category: Location, created_at: datetime, items_sold: int):
+    bump(category, hour_start(created_at), orders_created=1, items_sold=items_sold)
+
+
+def record_orders_readied(order_ids: list[int]):
+    """
+    Dolicza wydane zamówienia do godziny wydania: liczba i suma czasu
+    od złożenia do wydania. Jedno zapytanie + UPDATE na godzinę i stację.
+    """
+    hours = {}
+    rows = Order.objects.filter(id__in=order_ids, readied_at__isnull=False).values_list(
+        "category", "created_at", "readied_at"
+    )
+    for category, created_at, readied_at in rows:
+        key = (category, hour_start(readied_at))
+        count, total = hours.get(key, (0, timedelta(0)))
+        hours[key] = (count + 1, total + (readied_at - created_at))
+    for (category, hour), (count, total) in hours.items():
+        bump(category, hour, orders_readied=count, queue_time_total=total)
+
+
+def rebuild_hours(start: date, end: date) -> int:
+    """
+    Przelicza liczniki dni [start, end] z tabeli zamówień (do naprawy
+    i uzupełnienia historii). Zwraca liczbę zapisanych wierszy.
+    """
+    bounds = (day_bounds_local(start)[0], day_bounds_local(end)[1])
+    hours = {}
+
+    def counters(category, moment):
+        key = (category, hour_start(moment))
+        if key not in hours:
+            hours[key] = HourlyThroughput(hour=key[1], category=category)
+        return hours[key]
+
+    created = (
+        Order.objects.filter(created_at__range=bounds)
+        .annotate(items=Sum("order_items__quantity"))
+        .order_by()
+        .values_list("category", "created_at", "items")
+    )
+    for category, created_at, items in created.iterator(chunk_size=2000):
+        row = counters(category, created_at)
+        row.orders_created += 1
+        row.items_sold += items or 0
+
+    readied = (
+        Order.objects.filter(readied_at__range=bounds)
+        .order_by()
+        .values_list("category", "created_at", "readied_at")
+    )
+    for category, created_at, readied_at in readied.iterator(chunk_size=2000):
+        row = counters(category, readied_at)
+        row.orders_readied += 1
+        row.queue_time_total += readied_at - created_at
+
+    with transaction.atomic():
+        HourlyThroughput.objects.filter(hour__range=bounds).delete()
+        HourlyThroughput.objects.bulk_create(hours.values())
+    return len(hours)
+
+
+def _cell(counts: dict, wait: timedelta) -> dict:
+    readied = counts["orders_readied"]
+    return {
+        **counts,
+        "avg_queue": wait.total_seconds() / readied if readied else None,
+    }
+
+
+def _set_levels(cells: list[dict]):
+    """Natężenie komórki mapy (0-1) względem najruchliwszej godziny."""
+    peak = max((cell["orders_created"] for cell in cells), default=0)
+    for cell in cells:
+        cell["level"] = round(cell["orders_created"] / peak, 2) if peak else 0.0
+
+
+def hourly_heatmap(start: date, end: date) -> dict:
+    """
+    Mapa ruchu dni [start, end] dla każdej stacji: wiersz na dzień,
+    komórka na godzinę, plus wiersz sum wg godziny. Czyta tylko
+    `HourlyThroughput` (najwyżej 24 wiersze na dzień i stację).
+    """
+    bounds = (day_bounds_local(start)[0], day_bounds_local(end)[1])
+    rows = {}
+    for row in HourlyThroughput.objects.filter(hour__range=bounds):
+        local = timezone.localtime(row.hour)
+        rows[(row.category, local.date(), local.hour)] = row
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+    result = {}
+    for location in Location:
+        grid = []
+        totals = [dict.fromkeys(COUNTS, 0) for _ in range(24)]
+        waits = [timedelta(0)] * 24
+        for day in days:
+            cells = []
+            for hour in range(24):
+                row = rows.get((location.value, day, hour))
+                counts = {name: getattr(row, name, 0) for name in COUNTS}
+                wait = row.queue_time_total if row else timedelta(0)
+                cells.append(_cell(counts, wait))
+                for name in COUNTS:
+                    totals[hour][name] += counts[name]
+                waits[hour] += wait
+            grid.append({"date": day, "cells": cells})
+        by_hour = [_cell(counts, wait) for counts, wait in zip(totals, waits)]
+
+        _set_levels([cell for row in grid for cell in row["cells"]])
+        _set_levels(by_hour)
+        result[location.label] = {"days": grid, "by_hour": by_hour}
+    return result
@@ -4,15 +4,29 @@ from .views import (
     BillDeleteView,
     BillDetailView,
     BillListView,
+    board_check,
     daily_report,
     delete_order_item,
+    executor_stats_view,
+    prep_times_report,
+    range_report,
+    report_cache_stats_view,
+    report_export,
+    throughput_report,
     update_discount,
 )
 
 urlpatterns = [
     path("", daily_report, name="daily-report"),
+    path("range", range_report, name="range-report"),
+    path("export", report_export, name="report-export"),
+    path("prep-times", prep_times_report, name="prep-times-report"),
+    path("throughput", throughput_report, name="throughput-report"),
     path("update/discount/<int:pk>", update_discount, name="update-discount"),
     path("summary", BillListView.as_view(), name="summary-bill"),
+    path("board/check", board_check, name="board-check"),
+    path("executors/stats", executor_stats_view, name="executor-stats"),
+    path("report-cache/stats", report_cache_stats_view, name="report-cache-stats"),
     path("<int:pk>/delete/", BillDeleteView.as_view(), name="bill-delete"),
     path("<int:pk>/detail", BillDetailView.as_view(), name="bill-detail"),
     path(
@@ -4,18 +4,41 @@ from datetime import date as date_cls
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.contrib import messages
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Prefetch
 from django.db.utils import IntegrityError
-from django.http import Http404, HttpRequest, HttpResponse
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 from django.views.generic import DeleteView, DetailView, ListView
 
+from db_executors import executor_stats
 from menu.models import Location
 
-from .models import Bill, Item, OrderItem
-from .raport import daily_summary
+from .board import BOARDS, get_board
+from .export import EXPORTS, FORMATS, export_response
+from .models import Bill, Item, Order, OrderItem
+from .pagination import KeysetPaginationMixin
+from .prep_stats import prep_time_percentiles
+from .raport import period_bounds, report_from_facts
+from .report_cache import (
+    cached_report_for_day,
+    invalidate_bill_days,
+    report_cache_stats,
+)
+from .reporting import ReportingViewMixin, note_primary_write, reporting_view
+from .rollup import facts_for_range, refresh_bill_days
+from .summary import bill_summaries
+from .throughput import hourly_heatmap
 
 
 # Create your views here.
@@ -49,6 +72,7 @@ def item_list(request):
 
 
 @pin_required
+@reporting_view
 def daily_report(request):
     date_str = request.GET.get("date")
     if date_str:
@@ -59,7 +83,7 @@ def daily_report(request):
     else:
         chosen_date = timezone.localdate()
 
-    report = daily_summary(chosen_date)
+    report = cached_report_for_day(chosen_date)
 
     context = {
         "date": chosen_date,
@@ -68,6 +92,117 @@ def daily_report(request):
     return render(request, "order/raport.html", context)
 
 
+def _report_range(params):
+    """
+    Okres raportu z parametrów GET: `start` i `end` (YYYY-MM-DD) albo
+    `period` (week/month) wokół `date`. Błędne daty - dzień dzisiejszy.
+    """
+    today = timezone.localdate()
+    try:
+        if params.get("start"):
+            start = date_cls.fromisoformat(params["start"])
+            end = date_cls.fromisoformat(params.get("end") or params["start"])
+            return min(start, end), max(start, end)
+        anchor = date_cls.fromisoformat(params.get("date") or today.isoformat())
+    except ValueError:
+        anchor = today
+    return period_bounds(params.get("period", "day"), anchor)
+
+
+@pin_required
+@reporting_view
+def range_report(request):
+    start, end = _report_range(request.GET)
+    context = {
+        "date": start,
+        "date_end": end,
+        "report": report_from_facts(start, facts_for_range(start, end)),
+    }
+    return render(request, "order/raport.html", context)
+
+
+@pin_required
+@reporting_view
+def prep_times_report(request):
+    """Percentyle czasu przygotowania; domyślnie bieżący miesiąc."""
+    params = request.GET.copy()
+    params.setdefault("period", "month")
+    start, end = _report_range(params)
+    stats = prep_time_percentiles(start, end)
+    context = {
+        "start": start,
+        "end": end,
+        "stats": stats,
+        "sections": [
+            ("Wg pozycji", stats["by_item"]),
+            ("Wg dnia tygodnia", stats["by_weekday"]),
+            ("Wg godziny rozpoczęcia", stats["by_hour"]),
+        ],
+    }
+    return render(request, "order/prep_times.html", context)
+
+
+@pin_required
+@reporting_view
+def throughput_report(request):
+    """Ruch stacji wg godzin (mapa cieplna); domyślnie bieżący tydzień."""
+    params = request.GET.copy()
+    params.setdefault("period", "week")
+    start, end = _report_range(params)
+    context = {
+        "start": start,
+        "end": end,
+        "hours": range(24),
+        "heatmap": hourly_heatmap(start, end),
+    }
+    return render(request, "order/throughput.html", context)
+
+
+@pin_required
+@reporting_view
+def report_export(request):
+    """Eksport rachunków (`kind=bills`) lub sprzedaży wg id_checkout (`kind=checkout`)."""
+    kind = request.GET.get("kind", "bills")
+    fmt = request.GET.get("format", "csv")
+    if kind not in EXPORTS or fmt not in FORMATS:
+        return HttpResponseBadRequest("Unknown export kind or format")
+    start, end = _report_range(request.GET)
+    return export_response(
+        kind, fmt, start, end, asynchronous=isinstance(request, ASGIRequest)
+    )
+
+
+@pin_required
+def board_check(request):
+    """
+    Sprawdza zgodność tablic stacji w pamięci z bazą danych.
+    `resync=1` (tylko POST, np. formularz PIN pod `?resync=1`) przeładowuje
+    tablice, na których wykryto rozbieżności.
+    """
+    resync = request.method == "POST" and bool(
+        request.POST.get("resync") or request.GET.get("resync")
+    )
+    result = {}
+    for location, board in BOARDS.items():
+        problems = board.check() if board.is_loaded else []
+        if problems and resync:
+            board.load()
+        result[location] = {"loaded": board.is_loaded, "problems": problems}
+    return JsonResponse(result)
+
+
+@pin_required
+def executor_stats_view(request):
+    """Liczniki pul wątków konsumentów (kolejka, czas oczekiwania)."""
+    return JsonResponse(executor_stats())
+
+
+@pin_required
+def report_cache_stats_view(request):
+    """Liczniki cache raportów dziennych (trafienia, chybienia, unieważnienia)."""
+    return JsonResponse(report_cache_stats.stats())
+
+
 # TODO: what happened if pk doesn't exists or is wrong
 @require_POST
 def update_discount(request, pk: int):
@@ -76,8 +211,9 @@ def update_discount(request, pk: int):
     """
     try:
         bill = get_object_or_404(Bill, pk=pk)
-        bill.discount = int(request.POST.get("discount"))
-        bill.save(update_fields=["discount"])
+        bill.set_discount(int(request.POST.get("discount")))
+        invalidate_bill_days(bill)
+        note_primary_write(request)
     except IntegrityError:
         messages.add_message(
             request, messages.ERROR, "Można dodać tylko zniżki od 0% - 100%"
@@ -87,19 +223,32 @@ def update_discount(request, pk: int):
     return redirect("service:bill-detail", pk=pk)
 
 
-class BillListView(ListView):
+# z kopii raportowej; po własnym zapisie (usunięcie, rabat) użytkownik
+# czyta z `default`, dopóki kopia go nie obejmie (`note_primary_write`)
+class BillListView(ReportingViewMixin, KeysetPaginationMixin, ListView):
     model = Bill
     template_name = "order/bill_summary_list.html"
-    paginate_by = 24  # opcjonalnie
+    paginate_by = 24  # kursor po (created_at, id), zob. order.pagination
 
     def get_queryset(self):
-        # prefetch: orders -> order_items -> order_item_additions
+        # pozycje nie są potrzebne - podsumowania liczy bill_summaries
         return (
             Bill.objects.select_related("service")
-            .prefetch_related("table", "orders__order_items__order_item_additions")
-            .order_by("-created_at")
+            .prefetch_related(
+                "table", Prefetch("orders", queryset=Order.objects.only("id", "bill"))
+            )
+            .order_by("-created_at", "-id")
         )
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # podsumowania całej strony w dwóch zapytaniach grupujących
+        bills = context["object_list"]
+        summaries = bill_summaries(bills)
+        for bill in bills:
+            bill.summary = summaries[bill.pk]
+        return context
+
 
 class BillDetailView(DetailView):
     model = Bill
@@ -108,7 +257,7 @@ class BillDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         obj = context["object"]
-        order_items = obj.orders.prefetch_related("order_items__order_item_additions")
+        order_items = obj.orders.prefetch_related("order_items")
         items = []
         for order in order_items:
             for order_item in order.order_items.all():
@@ -140,8 +289,11 @@ class BillDeleteView(DeleteView):
         else:
             messages.info(request, f"Usunięto Bill #{self.object.pk}.")
 
-        # TODO: check and release tables
-        return super().post(request, *args, **kwargs)
+        # stoliki otwartego rachunku zwalnia sygnał pre_delete (order/signals.py)
+        response = super().post(request, *args, **kwargs)
+        invalidate_bill_days(self.object)
+        note_primary_write(request)
+        return response
 
 
 def send_delete_order_item_to_kitchen(pk_order, pk_item):
@@ -156,10 +308,17 @@ def send_delete_order_item_to_kitchen(pk_order, pk_item):
 
 
 def delete_order_item(request: HttpRequest, pk_order: int, pk_item: int):
-    object_item = OrderItem.objects.get(pk=pk_item)
+    object_item = OrderItem.objects.select_related("order__bill").get(pk=pk_item)
     object_name = object_item.full_name_snapshot
     object_location = object_item.menu_item.preparation_location
-    object_item.delete()
+    with transaction.atomic():
+        amount = object_item.total_cost
+        object_item.delete()
+        object_item.order.bill.add_to_subtotal(-amount)
+        refresh_bill_days(object_item.order.bill)
+        invalidate_bill_days(object_item.order.bill)
+    note_primary_write(request)
+    get_board(object_item.order.category).remove_item(object_item.order_id, pk_item)
     messages.success(
         request,
         f"Usunięto {object_name}."
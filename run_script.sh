@@ -28,6 +28,13 @@ pip install -r requirements.txt
 python3 manage.py makemigrations
 python3 manage.py migrate
 
+# uzupełnienie kolumn dodanych do istniejących wierszy (sumy rachunków,
+# liczniki stolików, nazwy pozycji); poprawiają tylko rozbieżności, więc
+# kolejne starty nic nie zmieniają
+python3 manage.py check_bill_totals --fix
+python3 manage.py recount_table_occupancy --fix
+python3 manage.py backfill_display_names
+
 echo "start redis"
 docker start redis
 echo "redis started"
@@ -1,9 +1,10 @@
 import json
 
-from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from db_executors import db_read, db_write
 from order.models import Notification, NotificationStatus
+from order.notifications import notification_payload, notifications_queryset
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
@@ -35,7 +36,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             return
 
         if data.get("action") == "notification_seen" and data.get("notification_id"):
-            await sync_to_async(self.mark_notification_seen)(data["notification_id"])
+            await db_write(self.mark_notification_seen)(data["notification_id"])
             await self.channel_layer.group_send(
                 self.notification_group_name,
                 {
@@ -65,19 +66,18 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     async def new_notification(self, event):
         await self.send(text_data=json.dumps({"type": "new_notification", **event}))
 
-    @sync_to_async
+    async def new_notifications(self, event):
+        await self.send(
+            text_data=json.dumps(
+                {"type": "new_notifications", "notifications": event["notifications"]}
+            )
+        )
+
+    @db_read
     def get_initial_notifications(self):
-        qs = Notification.objects.filter(status=NotificationStatus.WAIT).order_by(
-            "last_update"
+        qs = (
+            notifications_queryset()
+            .filter(status=NotificationStatus.WAIT)
+            .order_by("last_update")
         )
-        return [
-            {
-                "id": n.id,
-                "worker": str(n.worker),
-                "order_item": n.order_item.full_name_snapshot
-                + (f" ({n.order_item.note})" if n.order_item.note else ""),
-                "table": n.order_item.order.bill.str_tables(),
-                "created_at": n.last_update.isoformat(),
-            }
-            for n in qs
-        ]
+        return [notification_payload(n) for n in qs]
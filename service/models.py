@@ -9,6 +9,9 @@ class Table(models.Model):
     btn_type = models.CharField(max_length=100, blank=True, null=True)
     is_active = models.BooleanField(default=True)
     is_occupied = models.BooleanField(default=False)
+    open_bills = models.PositiveIntegerField(
+        default=0, help_text="Number of open bills at this table"
+    )
 
     def __str__(self):
         return self.name
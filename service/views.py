@@ -1,8 +1,8 @@
-from typing import Iterable, Optional
+from decimal import Decimal
+from typing import Iterable
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Q
 from django.http import HttpResponseNotFound, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
@@ -12,6 +12,7 @@ from django.views.decorators.http import require_POST
 from django.views.generic import DetailView, ListView
 
 from menu.models import Item, Location, MenuType
+from order.board import publish_new_order
 from order.models import (
     Bill,
     Notification,
@@ -22,6 +23,9 @@ from order.models import (
     PaymentMethod,
     StatusBill,
 )
+from order.reporting import note_primary_write
+from order.snapshots import order_item_sort_key
+from order.throughput import record_order_created
 from worker.models import Position, Worker
 
 from .models import Table
@@ -98,32 +102,74 @@ def api_remove_from_cart(request, index):
     return redirect("service:cart-waiter")
 
 
-def create_order(bill: Bill, items: Iterable[dict], **kwargs):
+def create_order(bill: Bill, items: Iterable[dict], sender: str, tables: str, **kwargs):
+    """
+    Zapisuje zamówienie, pozycje, dodatki i notyfikacje stałą liczbą
+    zapytań (bulk_create) w jednej transakcji.
+    Powiadomienie dla kuchni/baru budowane jest z koszyka i zapisanych
+    wierszy (bez ponownego czytania bazy) i wysyłane dopiero po commicie.
+    """
     if not items:
         return
-    order = Order.objects.create(bill=bill, **kwargs)
-    for item in items:
-        payload = {
-            "order": order,
-            "menu_item_id": item["item_id"],
-            "name_snapshot": item["name"],
-            "price_snapshot": item["price"],
-            "quantity": item["quantity"],
-            "note": item["note"],
-        }
-        order_item = OrderItem.objects.create(**payload)
-        for addition in item["additions"]:
-            OrderItemAddition.objects.create(
-                order_item=order_item,
-                addition_id=addition["id"],
-                name_snapshot=addition["name"],
-                price_snapshot=addition["price"],
+    with transaction.atomic():
+        order = Order.objects.create(bill=bill, **kwargs)
+        order_items = OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    menu_item_id=item["item_id"],
+                    name_snapshot=item["name"],
+                    display_name=OrderItem.build_full_name(
+                        item["name"], (a["name"] for a in item["additions"])
+                    ),
+                    price_snapshot=item["price"],
+                    quantity=item["quantity"],
+                    note=item["note"],
+                )
+                for item in items
+            ]
+        )
+        OrderItemAddition.objects.bulk_create(
+            [
+                OrderItemAddition(
+                    order_item=order_item,
+                    addition_id=addition["id"],
+                    name_snapshot=addition["name"],
+                    price_snapshot=addition["price"],
+                )
+                for order_item, item in zip(order_items, items)
+                for addition in item["additions"]
+            ]
+        )
+        bill.add_to_subtotal(
+            sum(
+                (
+                    (
+                        Decimal(item["price"])
+                        + sum(Decimal(a["price"]) for a in item["additions"])
+                    )
+                    * item["quantity"]
+                    for item in items
+                ),
+                Decimal("0.00"),
             )
-    if kwargs["category"] == Location.KITCHEN:
-        group_name = "kitchen_orders"
-    else:
-        group_name = "bar_orders"
-    send_payload_to_recipient(order.pk, group_name, bill.service.user.username)
+        )
+        record_order_created(
+            order.category, order.created_at, sum(item["quantity"] for item in items)
+        )
+        # bulk_create pomija OrderItem.save(), więc notyfikacje tworzymy tu
+        if bill.service_id is not None:
+            Notification.objects.bulk_create(
+                [
+                    Notification(worker_id=bill.service_id, order_item=order_item)
+                    for order_item in order_items
+                ]
+            )
+
+        order_detail = build_order_details(order, order_items, sender, tables)
+        transaction.on_commit(
+            lambda: publish_new_order(kwargs["category"], order_detail)
+        )
 
 
 def do_order(request):
@@ -140,23 +186,23 @@ def do_order(request):
     # tables = [table for table in tables]
     if cart and waiter:
         if bill_pk:
-            bill = Bill.objects.get(pk=bill_pk)
+            bill = Bill.objects.select_related("service__user").get(pk=bill_pk)
         else:
             bill = Bill.objects.create(service_id=waiter, note=note)
-            bill.table.add(*tables)
+            bill.occupy_tables(tables)
 
-        print(
-            f"Saved bill: {bill}, table from db: {Bill.objects.get(pk=bill.pk).table}"
-        )
+        # dane do powiadomienia kuchni/baru czytamy raz dla obu zamówień
+        sender = bill.service.user.username
+        tables_label = bill.str_tables()
         # split into 2 orders if exists!
         kitchen = filter(lambda data: data["category"] == Location.KITCHEN, cart)
         bar = filter(lambda data: data["category"] == Location.BAR, cart)
-        create_order(bill, list(kitchen), category=Location.KITCHEN)
-        create_order(bill, list(bar), category=Location.BAR)
+        create_order(
+            bill, list(kitchen), sender, tables_label, category=Location.KITCHEN
+        )
+        create_order(bill, list(bar), sender, tables_label, category=Location.BAR)
 
-        # change tables status
         print(f"{tables = }")
-        Table.objects.filter(pk__in=tables).update(is_occupied=True)
         request.session["cart"] = []
         request.session["tables"] = []
         del request.session["waiter"]
@@ -169,48 +215,37 @@ def do_order(request):
     return HttpResponseNotFound("<h1>Page not found</h1>")
 
 
-def get_order_details(order_id, sender: str) -> Optional[dict]:
-    try:
-        order = Order.objects.get(pk=order_id)
-    except Order.DoesNotExist:
-        return None
-    # if order.category == Location.BAR:
-    #     return
-
-    order_items = []
-    for item in order.order_items.order_by("name_snapshot").all():
-        order_items.append(
+def build_order_details(
+    order: Order, order_items: list[OrderItem], sender: str, tables: str
+) -> dict:
+    """
+    Payload `new_order` dla ekranów stacji zbudowany z danych koszyka
+    i świeżo zapisanych wierszy, bez zapytań do bazy.
+    """
+    order_items_payload = []
+    for order_item in sorted(order_items, key=order_item_sort_key):
+        order_items_payload.append(
             {
-                "id": item.id,
-                "name_snapshot": item.full_name_snapshot,
-                "quantity": item.quantity,
-                "note": item.note,
+                "id": order_item.id,
+                "name_snapshot": order_item.display_name,
+                "quantity": order_item.quantity,
+                "note": order_item.note,
+                "is_done": False,
             }
         )
 
     return {
         "id": order.id,
         "sender": sender,
-        "table": order.bill.str_tables(),
+        "table": tables,
         "status": order.status,
-        "order_items": order_items,
+        "order_items": order_items_payload,
         "created_at": timezone.localtime(order.created_at).strftime(
             "%Y-%m-%d %H:%M:%S"
         ),
     }
 
 
-def send_payload_to_recipient(pk: int, group_name: str, sender: str):
-    order_detail = get_order_details(pk, sender)
-    if order_detail is None:
-        return None
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {"type": "new_order", "order_data": order_detail},
-    )
-
-
 def cart(request):
     cart = request.session.get("cart", [])
     return render(request, "service/cart_waiter.html", {"cart": cart})
@@ -272,27 +307,14 @@ class BillDetailView(DetailView):
 
 @require_POST
 def close_bill(request, pk):
-    payment_method = request.POST.get("payment_method")
+    payment_method = PaymentMethod(
+        request.POST.get("payment_method")
+    )  # ValueError when somethind, was wrong
     bill = get_object_or_404(Bill, pk=pk)
-    if bill.status != StatusBill.OPEN:
+    if not bill.close(payment_method):
         messages.error(request, "Nie można zamknąć, zamkniętego rachunku!")
         return redirect("service:bill-detail", pk=pk)
-    # update fields
-    bill.status = StatusBill.CLOSED
-    bill.payment_method = PaymentMethod(
-        payment_method
-    )  # ValueError when somethind, was wrong
-    bill.closed_at = timezone.now()
-    bill.save(update_fields=["status", "payment_method", "closed_at"])
-
-    bill_tables = bill.table.all()
-    for table in bill_tables:
-        _number_of_open_bills = Bill.objects.filter(
-            Q(table=table) & Q(status=StatusBill.OPEN)
-        ).count()
-        if _number_of_open_bills == 0:
-            table.is_occupied = False
-            table.save()
+    note_primary_write(request)
     messages.success(request, f"Rachunek #{bill.pk} został zamknięty.")
     return redirect("service:menu-waiter")
 